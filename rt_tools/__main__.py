@@ -9,12 +9,12 @@ from os import path
 from rttool import rttool
 def main():
   # programa requires at least one command 
-  if len(sys.argv) != 4:
+  if len(sys.argv) != 4 and (len(sys.argv) != 5 or not sys.argv[4] in ['pkt', 'rta']):
     print("usage:")
-    print("  python3 " + sys.argv[0] + " <app.gml> <mapping.map> <noc.gml>")
+    print("  python3 " + sys.argv[0] + " <app.gml> <mapping.map> <noc.gml> [pkt|rta]")
     exit(0)
 
-  rttool(sys.argv[1], sys.argv[2], sys.argv[3])  
+  rttool(sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4] if len(sys.argv) == 5 else 'pkt')
 
 # Automatically jumps to main if called from command line
 if __name__ == "__main__":
@@ -0,0 +1,165 @@
+import sys
+import os
+import os.path
+import time
+import csv
+from os import path
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from terminal import info, warn, error, wsfill
+import pktgen
+
+# Batch runner. Runs the pipeline (see pktgen.py) for every triple of
+# a manifest, in a pool of worker processes. The pipeline writes to
+# paths relative to the working directory (../minizinc, ../applications),
+# so each run gets a directory of its own, laid out like the
+# repository, and its terminal output goes to a log file there.
+
+BATCH_WORKERS = None   # number of parallel runs (defaults to the number of cores)
+MODELS = os.path.dirname(os.path.realpath(__file__)) + "/../minizinc/CM"
+STAGES = ['read', 'expand', 'routes', 'table', 'precheck', 'solve', 'verify', 'export']
+COLUMNS = ['app', 'map', 'arch', 'mode', 'status', 'hp', 'flows', 'packets', 'links'] + STAGES + ['total', 'dir']
+
+# reads a manifest, one run per line: <app.gml> <mapping.map> <noc.gml>
+# and an optional mode (pkt or rta, see rttool.py). Blank lines and
+# lines starting with # are skipped. Paths are relative to the current
+# directory. Returns a list of jobs
+def readManifest(filename):
+  jobs = []
+  with open(filename) as file:
+    for n, line in enumerate(file):
+      fields = line.split()
+      if len(fields) == 0 or fields[0].startswith('#'):
+        continue
+
+      if len(fields) < 3 or len(fields) > 4 or (len(fields) == 4 and not fields[3] in ['pkt', 'rta']):
+        error("Malformed manifest entry at line " + str(n + 1) + ": " + line.strip())
+        exit(1)
+
+      jobs.append({
+        'index' : len(jobs),
+        'app' : os.path.abspath(fields[0]),
+        'map' : os.path.abspath(fields[1]),
+        'arch' : os.path.abspath(fields[2]),
+        'mode' : fields[3] if len(fields) == 4 else 'pkt'
+      })
+  return jobs
+
+# returns the name of a model file, without folder and extension
+def getBaseName(filename):
+  return filename.split('/')[-1].split('.')[0]
+
+# creates the run directory of a job. The pipeline runs from its
+# rt_tools folder, and the minizinc models are linked into it
+def makeRunDir(outdir, job):
+  rundir = (outdir + "/" + wsfill(job['index'], 4).replace(' ', '0') + "-" +
+    getBaseName(job['app']) + "-" + getBaseName(job['map']) + "-" + getBaseName(job['arch']))
+  for d in ['rt_tools', 'minizinc', 'applications', 'pkt-sim/packets', 'schedules']:
+    os.makedirs(rundir + "/" + d, exist_ok=True)
+  if not path.exists(rundir + "/minizinc/CM"):
+    os.symlink(MODELS, rundir + "/minizinc/CM")
+  return rundir
+
+# runs a single job within its run directory (see makeRunDir), and
+# returns its summary (see pktgen.startSummary)
+def runJob(job, rundir, threads):
+  os.chdir(rundir + "/rt_tools")
+  pktgen.PLOT = False
+  pktgen.ZINC_THREADS = threads
+  pktgen.SIM_LOCATION = rundir + "/pkt-sim/packets/"
+  pktgen.SCHEDULE_CACHE = rundir + "/schedules/"
+
+  summary = {}
+  started = time.time()
+  with open(rundir + "/log.txt", "w") as log, redirect_stdout(log):
+    try:
+      if job['mode'] == 'rta':
+        pktgen.rtaGen(job['app'], job['map'], job['arch'], summary)
+      else:
+        pktgen.pktGen(job['app'], job['map'], job['arch'], summary)
+    except SystemExit:
+      pass
+    except Exception as e:
+      error(type(e).__name__ + ": " + str(e))
+      summary['status'] = 'error'
+
+  # the stage clock is internal to the run (see pktgen.markStage)
+  summary.pop('clock', None)
+  summary['total'] = time.time() - started
+  return summary
+
+# returns the row of the summary table of a job
+def getRow(job, rundir, summary):
+  row = {
+    'app' : getBaseName(job['app']),
+    'map' : getBaseName(job['map']),
+    'arch' : getBaseName(job['arch']),
+    'mode' : job['mode'],
+    'status' : summary.get('status', 'error'),
+    'dir' : rundir
+  }
+  for c in ['hp', 'flows', 'packets', 'links']:
+    row[c] = summary.get(c, '')
+  timings = summary.get('timings', {})
+  for s in STAGES + ['total']:
+    t = timings.get(s, summary.get(s))
+    row[s] = '' if t == None else '%.3f' % t
+  return row
+
+# runs every job of the manifest and writes the summary table to
+# <outdir>/summary.csv. Solver threads are split among the workers
+def runBatch(manifest, outdir):
+  jobs = readManifest(manifest)
+  outdir = os.path.abspath(outdir)
+  os.makedirs(outdir, exist_ok=True)
+  info("Read " + str(len(jobs)) + " runs from `" + manifest + "`")
+
+  workers = BATCH_WORKERS
+  if workers == None:
+    workers = os.cpu_count()
+  workers = max(1, min(workers, len(jobs)))
+  threads = max(1, os.cpu_count() // workers)
+
+  rows = [None] * len(jobs)
+  with ProcessPoolExecutor(max_workers=workers) as pool:
+    futures = {}
+    for job in jobs:
+      rundir = makeRunDir(outdir, job)
+      futures[pool.submit(runJob, job, rundir, threads)] = (job, rundir)
+
+    for f in as_completed(futures):
+      job, rundir = futures[f]
+      try:
+        summary = f.result()
+      except Exception as e:
+        warn("Run `" + rundir + "` failed: " + str(e))
+        summary = {}
+      row = getRow(job, rundir, summary)
+      rows[job['index']] = row
+      info("... " + row['app'] + " / " + row['map'] + " / " + row['arch'] + " (" + row['mode'] +
+        "): " + row['status'] + " in " + row['total'] + "s")
+
+  summaryfile = outdir + "/summary.csv"
+  with open(summaryfile, "w", newline='') as file:
+    writer = csv.DictWriter(file, fieldnames=COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+  statuses = {}
+  for r in rows:
+    statuses[r['status']] = statuses.get(r['status'], 0) + 1
+  info("Summary written to `" + summaryfile + "` (" +
+    ", ".join([s + "=" + str(statuses[s]) for s in sorted(statuses)]) + ")")
+  return rows
+
+def main():
+  if len(sys.argv) != 3:
+    print("usage:")
+    print("  python3 " + sys.argv[0] + " <manifest> <outdir>")
+    exit(0)
+
+  runBatch(sys.argv[1], sys.argv[2])
+
+# Automatically jumps to main if called from command line
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import os
+import os.path
+from os import path
+
+# Content-addressed cache of solver results. Results are indexed by a
+# hash of everything that determines them: the data file (.dzn), the
+# model file, the solver and its options. Each entry stores the raw
+# solver output along with the parsed release vector (None when the
+# problem is unsatisfiable).
+
+# size of the chunks read while hashing files, in bytes
+HASH_CHUNK = 1 << 20
+
+# feeds the contents of a file into the given hash
+def hashFile(h, filename):
+  with open(filename, 'rb') as file:
+    while True:
+      chunk = file.read(HASH_CHUNK)
+      if len(chunk) == 0:
+        break
+      h.update(chunk)
+
+# returns the cache key for solving the given data file with the
+# given model, solver and solver options (any printable value)
+def getCacheKey(dznfile, model, solver, options):
+  h = hashlib.sha256()
+  for f in [dznfile, model]:
+    hashFile(h, f)
+    h.update(b'\0')
+  h.update(repr((solver, options)).encode('utf-8'))
+  return h.hexdigest()
+
+# location of the entry for the given key. Entries are spread
+# across subfolders, named after the first digits of the key
+def getCacheFile(cachedir, key):
+  return os.path.join(cachedir, key[:2], key + '.json')
+
+# loads a cached result, returns a dictionary containing the solver
+# `output` and the parsed `releases`, or None if not cached
+def loadResult(cachedir, key):
+  cachefile = getCacheFile(cachedir, key)
+  if not path.exists(cachefile):
+    return None
+  try:
+    with open(cachefile) as file:
+      return json.load(file)
+  except (OSError, ValueError):
+    return None
+
+# stores a result into the cache. The entry is written to a temporary
+# file first, so that concurrent runs never read partial entries
+def storeResult(cachedir, key, output, releases):
+  cachefile = getCacheFile(cachedir, key)
+  os.makedirs(os.path.dirname(cachefile), exist_ok=True)
+  tmpfile = cachefile + '.' + str(os.getpid()) + '.tmp'
+  with open(tmpfile, 'w') as file:
+    json.dump({'output' : output, 'releases' : releases}, file)
+  os.replace(tmpfile, cachefile)
@@ -0,0 +1,172 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import Event
+from linktable import numLinks, pruneUnused
+from dzn import writeDzn, writeCompactDzn
+from solver import runMinizinc, isFinal
+from cache import getCacheKey, loadResult, storeResult
+from parseznc import parseznc
+
+# Conflict-graph decomposition. Packets are vertices of the graph, and
+# packets sharing a link are connected. Packets of different connected
+# components never compete for links, thus each component is solved as
+# an independent problem.
+
+# finds the root of a packet in the union-find forest
+def find(parent, i):
+  while parent[i] != i:
+    parent[i] = parent[parent[i]]
+    i = parent[i]
+  return i
+
+# returns the connected components of the conflict graph of the given
+# link table, as a list of sorted arrays of packet indexes (largest
+# components first)
+def getComponents(table):
+  parent = list(range(0, table['num_packets']))
+  rowptr = table['rowptr']
+  for l in range(0, numLinks(table)):
+    pkts = table['packet'][rowptr[l]:rowptr[l + 1]].tolist()
+    if len(pkts) > 1:
+      root = find(parent, pkts[0])
+      for p in pkts[1:]:
+        r = find(parent, p)
+        if r != root:
+          parent[r] = root
+
+  roots = np.array([find(parent, i) for i in range(0, len(parent))], dtype=np.int64)
+  order = np.argsort(roots, kind='stable')
+  bounds = np.flatnonzero(np.diff(roots[order])) + 1
+  components = np.split(order, bounds)
+  components.sort(key=lambda x : len(x), reverse=True)
+  return components
+
+# restricts the link table to the given (sorted) packet indexes.
+# Packets are renumbered from zero and unused links are removed
+def subTable(table, pkts):
+  mask = np.isin(table['packet'], pkts)
+  sub = dict(table)
+  sub['num_packets'] = len(pkts)
+  for field in ['link', 'packet', 'occupancy', 'min_start', 'deadline']:
+    sub[field] = table[field][mask]
+  sub['packet'] = np.searchsorted(pkts, sub['packet']).astype(np.int32)
+  sub['rowptr'] = np.searchsorted(sub['link'], np.arange(numLinks(table) + 1))
+  sub, removed = pruneUnused(sub)
+  return sub
+
+# solves a single packet: released at its min_start, if it fits
+def solveSingle(packet, hp):
+  end = packet['min_start'] + packet['net_time']
+  if end > packet['abs_deadline'] or end > hp:
+    return None
+  return [packet['min_start']]
+
+# set in worker processes, signals that the remaining solvers must stop
+cancel_event = None
+
+# sets up a worker process of the pool of sub-solves
+def initWorker(event):
+  global cancel_event
+  cancel_event = event
+
+# solves one component (worker process). Returns the release times of
+# the packets of the component (None if there are none) and the
+# outcome: 'solved', 'unsatisfiable' (proven by the solver), or
+# 'unknown' (time limit, error, or cancelled)
+def solveComponent(args):
+  packets, table, hp, mzFile, model, export, solver, threads, cachedir, timeout, memory = args
+
+  if export == 'compact':
+    writeCompactDzn(mzFile, hp, packets, table)
+  else:
+    writeDzn(mzFile, hp, table)
+
+  # results are cached per component (see cache.py), keyed like
+  # single runs (see pktgen.getSolverOptions): threads depend on the
+  # machine and do not change final answers
+  key = None
+  if cachedir != None and os.path.exists(model):
+    key = getCacheKey(mzFile, model, solver, None)
+    cached = loadResult(cachedir, key)
+    if cached != None:
+      return cached['releases'], 'solved' if cached['releases'] != None else 'unsatisfiable'
+
+  result = runMinizinc(model, mzFile, solver, threads, False, timeout, memory, cancel_event)
+  zincres = result['output']
+  releases = None
+  status = 'unknown'
+  if result['status'] == 'SATISFIED':
+    releases = parseznc(zincres)
+    status = 'solved'
+  elif result['status'] == 'UNSATISFIABLE':
+    status = 'unsatisfiable'
+
+  if key != None and isFinal(result):
+    storeResult(cachedir, key, zincres, releases)
+
+  return releases, status
+
+# solves every component, merging release times back into a single
+# vector. Single-packet components are solved right away, the others
+# are solved in a pool of worker processes, each one writing its own
+# data file (mzFile-c<k>.dzn). Returns the release times (None if
+# some component has none) and the outcome (see solveComponent). Once
+# a component is unsatisfiable, the solvers still running are killed.
+# Results are cached in cachedir, unless it is None.
+# Each solver run is bound by the given time (seconds) and memory
+# (megabytes) limits, None for no limit. Components are solved by the
+# given solver alone, solver portfolios are not raced here
+def solveComponents(packets, table, hp, components, mzFile, model, export, solver, workers, cachedir, timeout, memory):
+  releases = [None] * len(packets)
+
+  jobs = {}
+  for k in range(0, len(components)):
+    pkts = components[k]
+    if len(pkts) == 1:
+      res = solveSingle(packets[pkts[0]], hp)
+      if res == None:
+        return None, 'unsatisfiable'
+      releases[pkts[0]] = res[0]
+    else:
+      jobs[k] = pkts
+
+  if len(jobs) == 0:
+    return releases, 'solved'
+
+  if workers == None:
+    workers = os.cpu_count()
+  workers = max(1, min(workers, len(jobs)))
+
+  # split available cores among solver instances
+  threads = max(1, os.cpu_count() // workers)
+
+  cancel = Event()
+  unknown = False
+  with ProcessPoolExecutor(max_workers=workers, initializer=initWorker, initargs=(cancel,)) as pool:
+    futures = {}
+    for k in jobs:
+      pkts = jobs[k]
+      args = ([packets[i] for i in pkts], subTable(table, pkts), hp,
+        mzFile.replace('.dzn', '-c' + str(k) + '.dzn'), model, export, solver, threads, cachedir, timeout, memory)
+      futures[pool.submit(solveComponent, args)] = k
+
+    for future in as_completed(futures):
+      res, status = future.result()
+      if status == 'unsatisfiable':
+        # no need to wait for other components, pending ones are
+        # dropped and running solvers are killed
+        cancel.set()
+        for f in futures:
+          f.cancel()
+        return None, 'unsatisfiable'
+      if res == None:
+        # other components may still prove the problem unsatisfiable
+        unknown = True
+        continue
+      for i, r in zip(jobs[futures[future]].tolist(), res):
+        releases[i] = r
+
+  if unknown:
+    return None, 'unknown'
+  return releases, 'solved'
@@ -0,0 +1,94 @@
+from linktable import numLinks, conflictSets
+
+# width of each cell in exported tables
+ZINC_INPUT_PAD = 5
+
+# size of the write buffer, in bytes
+WRITE_BUFFER = 1 << 20
+
+# writes one link-by-packet table (see linktable.py) into an open file,
+# one row at a time, so that only one row is held in memory. Empty
+# cells share a single preformatted string, only the cells used by
+# packets are formatted
+def writeTable(file, label, table, field):
+  file.write(label + " = \n")
+
+  fmt = "%" + str(ZINC_INPUT_PAD) + "d,   "
+  empty = fmt % -1
+  rowptr = table['rowptr']
+  first_line = True
+  for i in range(0, numLinks(table)):
+    a = rowptr[i]
+    b = rowptr[i + 1]
+    cells = [empty] * table['num_packets']
+    for p, v in zip(table['packet'][a:b].tolist(), table[field][a:b].tolist()):
+      cells[p] = fmt % v
+
+    file.write("[| " if first_line else " | ")
+    file.write("".join(cells))
+    file.write("%" + table['labels'][i] + "\n")
+    first_line = False
+
+  # tables with no rows are still valid
+  if first_line:
+    file.write("[")
+
+  file.write("|];\n")
+
+# writes the minizinc input (hyperperiod and link-by-packet tables)
+# for a given problem into the given file
+def writeDzn(filename, hp, table):
+  with open(filename, 'w+', buffering=WRITE_BUFFER) as file:
+    file.write("hp = " + str(hp) + ";\n")
+    file.write("num_links = " + str(numLinks(table)) + ";\n")
+    file.write("num_packets = " + str(table['num_packets']) + ";\n")
+    file.write("\n")
+    writeTable(file, "occupancy", table, "occupancy")
+    file.write("\n")
+    writeTable(file, "deadline", table, "deadline")
+    file.write("\n")
+    writeTable(file, "min_start", table, "min_start")
+
+# writes an one-dimensional array, one value per packet
+def writeArray(file, label, values):
+  file.write(label + " = [" + ", ".join([str(v) for v in values]) + "];\n")
+
+# writes the minizinc input for the compact model (one release time
+# per packet, see CM-compact-*.mzn). Instead of link-by-packet tables,
+# only the conflict sets of packets sharing links are listed
+def writeCompactDzn(filename, hp, packets, table):
+  sets = conflictSets(table)
+  with open(filename, 'w+', buffering=WRITE_BUFFER) as file:
+    file.write("hp = " + str(hp) + ";\n")
+    file.write("num_links = " + str(len(sets)) + ";\n")
+    file.write("num_packets = " + str(len(packets)) + ";\n")
+    file.write("\n")
+    writeArray(file, "occupancy", [p['net_time'] for p in packets])
+    writeArray(file, "deadline", [p['abs_deadline'] for p in packets])
+    writeArray(file, "min_start", [p['min_start'] for p in packets])
+    file.write("\n")
+    file.write("link_packets = [\n")
+    for i in range(0, len(sets)):
+      l, s = sets[i]
+      # packets are 1-indexed in minizinc
+      file.write("  {" + ",".join([str(p + 1) for p in s]) + "}" +
+        ("," if i < len(sets) - 1 else " ") + "   %" + l + "\n")
+    file.write("];\n")
+
+# writes the minizinc input for the flow-level model (one offset per
+# flow, see CM-flow-*.mzn). Pairs are given as (i, j, gcd of periods)
+# of flows sharing links, see flowlevel.getFlowConflicts
+def writeFlowDzn(filename, flows, routes, pairs):
+  with open(filename, 'w+', buffering=WRITE_BUFFER) as file:
+    file.write("num_flows = " + str(len(flows)) + ";\n")
+    file.write("num_pairs = " + str(len(pairs)) + ";\n")
+    file.write("\n")
+    writeArray(file, "period", [f['period'] for f in flows])
+    writeArray(file, "deadline", [f['deadline'] for f in flows])
+    writeArray(file, "occupancy", [routes[f['name']]['net_time'] for f in flows])
+    file.write("\n")
+
+    # flows are 1-indexed in minizinc
+    file.write("pairs = array2d(1.." + str(len(pairs)) + ", 1..2, [" +
+      ", ".join([str(i + 1) + ", " + str(j + 1) for i, j, g in pairs]) + "]);\n")
+    writeArray(file, "pair_gcd", [g for i, j, g in pairs])
@@ -0,0 +1,142 @@
+import numpy as np
+from bisect import bisect_right
+from linktable import numLinks
+
+# Necessary conditions for a schedule to exist, checked on the link
+# table before solving. Packets on the same link must be one cycle
+# apart, so each one takes occupancy + 1 cycles of its link, and all
+# of them must end within the hyperperiod (cycles 0 to hp).
+
+# returns the flows of the given packet indexes, sorted
+def getFlows(packets, pkts):
+  return sorted(set([packets[i]['flow'] for i in pkts]))
+
+# packets whose network time does not fit their own window
+def checkWindows(packets, hp):
+  res = []
+  for p in packets:
+    window = min(p['abs_deadline'], hp) - p['min_start']
+    if p['net_time'] > window:
+      res.append(('window', p['name'], "net_time " + str(p['net_time']) +
+        " exceeds window of " + str(window) + " cycles", [p['flow']]))
+  return res
+
+# builds a tree over the given values, which supports adding a value
+# to a range of them and finding the largest one. Each node holds the
+# largest value below it, including the adds pending on the node
+def newMaxTree(values):
+  n = 1
+  while n < len(values):
+    n = n * 2
+  low = min(values) if len(values) > 0 else 0
+  best = [low for i in range(0, 2 * n)]
+  best[n:n + len(values)] = values
+  for i in range(n - 1, 0, -1):
+    best[i] = max(best[2 * i], best[2 * i + 1])
+  return {'size' : n, 'best' : best, 'add' : [0 for i in range(0, n)]}
+
+# adds v to the values of [l, r) of the tree
+def addRange(tree, l, r, v):
+  n = tree['size']
+  best = tree['best']
+  add = tree['add']
+  l = l + n
+  r = r + n
+  l0 = l
+  r0 = r - 1
+  while l < r:
+    if l & 1:
+      best[l] += v
+      if l < n:
+        add[l] += v
+      l = l + 1
+    if r & 1:
+      r = r - 1
+      best[r] += v
+      if r < n:
+        add[r] += v
+    l = l >> 1
+    r = r >> 1
+  for i in [l0, r0]:
+    i = i >> 1
+    while i > 0:
+      best[i] = max(best[2 * i], best[2 * i + 1]) + add[i]
+      i = i >> 1
+
+# returns the index and value of the largest value of the tree
+def argMax(tree):
+  best = tree['best']
+  i = 1
+  while i < tree['size']:
+    target = best[i] - tree['add'][i]
+    i = 2 * i if best[2 * i] == target else 2 * i + 1
+  return i - tree['size'], best[1]
+
+# returns the first window [a, b] (as (a, b, demand)) in which the
+# packets released from a on and due by b take more cycles than the
+# window has, or None. Candidate windows start at release times and end
+# at deadlines. Packets are swept by deadline b, keeping a + demand of
+# the window [a, b] for each start a in a tree (see newMaxTree). Starts
+# after b are offset by a penalty until b reaches them
+def findOverload(min_start, deadline, weight):
+  order = np.argsort(deadline, kind='stable')
+  min_start = min_start[order].tolist()
+  deadline = deadline[order].tolist()
+  weight = weight[order].tolist()
+
+  starts = sorted(set(min_start))
+  penalty = sum(weight) + max(deadline + starts) + 2
+  tree = newMaxTree([a - penalty for a in starts])
+  active = 0
+  for i in range(0, len(weight)):
+    b = deadline[i]
+    while active < len(starts) and starts[active] <= b:
+      addRange(tree, active, active + 1, penalty)
+      active = active + 1
+
+    # the packet counts for the windows starting up to its release,
+    # windows ending at b are checked once all their packets count
+    addRange(tree, 0, bisect_right(starts, min_start[i]), weight[i])
+    if i + 1 < len(weight) and deadline[i + 1] == b:
+      continue
+    if tree['best'][1] > b + 1:
+      k, best = argMax(tree)
+      return (starts[k], b, best - starts[k])
+  return None
+
+# checks per-link utilization over the hyperperiod and demand within
+# windows of release times and deadlines
+def checkLinks(packets, table, hp):
+  res = []
+  rowptr = table['rowptr']
+  for l in range(0, numLinks(table)):
+    a = rowptr[l]
+    b = rowptr[l + 1]
+    if b - a < 2:
+      continue
+
+    pkts = table['packet'][a:b]
+    weight = table['occupancy'][a:b] + 1
+    label = table['labels'][l]
+
+    busy = int(weight.sum())
+    if busy > hp + 1:
+      res.append(('utilization', label, str(busy) + " cycles needed, " +
+        str(hp + 1) + " available", getFlows(packets, pkts.tolist())))
+      continue
+
+    deadline = np.minimum(table['deadline'][a:b], hp)
+    overload = findOverload(table['min_start'][a:b], deadline, weight)
+    if overload != None:
+      s, d, demand = overload
+      inside = pkts[(table['min_start'][a:b] >= s) & (deadline <= d)]
+      res.append(('demand', label, str(demand) + " cycles needed within [" + str(s) + ", " +
+        str(d) + "], " + str(d - s + 1) + " available", getFlows(packets, inside.tolist())))
+
+  return res
+
+# checks necessary conditions for the given problem. Returns a list
+# of (kind, link label or packet name, detail, flows involved), empty
+# if no condition is violated (which does not mean it is feasible)
+def checkFeasibility(packets, table, hp):
+  return checkWindows(packets, hp) + checkLinks(packets, table, hp)
@@ -0,0 +1,85 @@
+import numpy as np
+from math import gcd
+from linktable import numLinks
+
+# Flow-first (hierarchical) solving. A small flow-level problem gives
+# each flow an offset within its period, so that the packets of a flow
+# are released strictly periodically. Offsets are then expanded into
+# packets release times, and only packets left in conflict are solved
+# again at the packet level.
+
+# returns the pairs (i, j), i < j, of indexes of flows sharing
+# at least one link, along with the gcd of their periods
+def getFlowConflicts(flows, routes):
+  users = {}
+  for i in range(0, len(flows)):
+    for l in routes[flows[i]["name"]]["path"]:
+      label = l["data"]["label"]
+      if not label in users:
+        users[label] = []
+      users[label].append(i)
+
+  pairs = set()
+  for label in users:
+    u = users[label]
+    for a in range(0, len(u)):
+      for b in range(a + 1, len(u)):
+        pairs.add((min(u[a], u[b]), max(u[a], u[b])))
+
+  res = []
+  for i, j in sorted(pairs):
+    res.append((i, j, gcd(flows[i]["period"], flows[j]["period"])))
+  return res
+
+# expands flow offsets into packets release times
+def expandOffsets(packets, flows, offsets):
+  offset = {}
+  for i in range(0, len(flows)):
+    offset[flows[i]["name"]] = offsets[i]
+  return [p["min_start"] + offset[p["flow"]] for p in packets]
+
+# returns the set of indexes of packets whose release times fall out of
+# their window or overlap other packets on some link (see linktable.py)
+def findConflicts(packets, table, releases, hp):
+  releases = np.asarray(releases, dtype=np.int64)
+  conflicts = set()
+
+  for i in range(0, len(packets)):
+    p = packets[i]
+    end = releases[i] + p["net_time"]
+    if releases[i] < p["min_start"] or end > p["abs_deadline"] or end > hp:
+      conflicts.add(i)
+
+  # packets sorted by release on each link. A packet overlaps (packets
+  # must be one cycle apart) if it starts before the latest end so far
+  rowptr = table["rowptr"]
+  for l in range(0, numLinks(table)):
+    pkts = table["packet"][rowptr[l]:rowptr[l + 1]]
+    occ = table["occupancy"][rowptr[l]:rowptr[l + 1]]
+    start = releases[pkts]
+    order = np.argsort(start, kind="stable")
+
+    latest = None
+    latestEnd = None
+    for k in order.tolist():
+      if latest != None and start[k] <= latestEnd:
+        conflicts.add(int(pkts[k]))
+        conflicts.add(latest)
+      if latest == None or start[k] + occ[k] > latestEnd:
+        latest = int(pkts[k])
+        latestEnd = start[k] + occ[k]
+
+  return conflicts
+
+# returns a copy of the packets in which all packets but the given free
+# ones are fixed at their release times: their window is narrowed to
+# [release, release + net_time], so that the solver cannot move them
+def fixPackets(packets, releases, free):
+  fixed = []
+  for i in range(0, len(packets)):
+    p = dict(packets[i])
+    if not i in free:
+      p["min_start"] = int(releases[i])
+      p["abs_deadline"] = int(releases[i]) + p["net_time"]
+    fixed.append(p)
+  return fixed
@@ -0,0 +1,71 @@
+from bisect import bisect_left, bisect_right
+from linktable import numLinks
+
+# Greedy list scheduling. Packets are taken one at a time, by priority,
+# and released at the earliest time at which every link of their path
+# is free. Each link keeps the intervals taken so far, as sorted lists
+# of starts and ends (intervals never overlap, so both lists are sorted).
+
+ORDERINGS = ['edf', 'lstf']
+
+# returns the links used by each packet of the table
+def getPacketLinks(table):
+  links = [[] for i in range(0, table['num_packets'])]
+  rowptr = table['rowptr']
+  for l in range(0, numLinks(table)):
+    for i in table['packet'][rowptr[l]:rowptr[l + 1]].tolist():
+      links[i].append(l)
+  return links
+
+# returns the order in which packets are placed: earliest deadline
+# first (edf), or least slack time first (lstf). Ties are broken by
+# the earliest release time
+def getPriorityOrder(packets, hp, ordering):
+  if ordering == 'lstf':
+    key = lambda i : (min(packets[i]['abs_deadline'], hp) - packets[i]['net_time'] -
+      packets[i]['min_start'], packets[i]['min_start'])
+  else:
+    key = lambda i : (packets[i]['abs_deadline'], packets[i]['min_start'])
+  return sorted(range(0, len(packets)), key=key)
+
+# returns the earliest release time, from t on, at which the interval
+# [release, release + occupancy] is free on every given link. Each
+# conflict moves the release time right after the conflicting interval
+def earliestFit(starts, ends, links, t, occupancy, latest):
+  moved = True
+  while moved and t <= latest:
+    moved = False
+    for l in links:
+      k = bisect_right(starts[l], t + occupancy) - 1
+      if k >= 0 and ends[l][k] >= t:
+        t = ends[l][k] + 1
+        moved = True
+  return t
+
+# schedules packets greedily (see ORDERINGS), each one at the earliest
+# release time with no conflicts along its whole path. Packets that do
+# not fit within their deadline (and the hyperperiod) are left out.
+# Returns the release time of each packet (None for packets left out)
+# and the list of packets left out
+def greedySchedule(packets, table, hp, ordering):
+  links = getPacketLinks(table)
+  starts = [[] for l in range(0, numLinks(table))]
+  ends = [[] for l in range(0, numLinks(table))]
+
+  releases = [None] * len(packets)
+  unplaced = []
+  for i in getPriorityOrder(packets, hp, ordering):
+    p = packets[i]
+    latest = min(p['abs_deadline'], hp) - p['net_time']
+    t = earliestFit(starts, ends, links[i], p['min_start'], p['net_time'], latest)
+    if t > latest:
+      unplaced.append(i)
+      continue
+
+    releases[i] = t
+    for l in links[i]:
+      k = bisect_left(starts[l], t)
+      starts[l].insert(k, t)
+      ends[l].insert(k, t + p['net_time'])
+
+  return releases, unplaced
@@ -0,0 +1,127 @@
+from bisect import bisect_left
+from math import gcd
+from lcm import hyperperiod, countPackets
+
+# Period harmonization. Periods are rounded down to a harmonic set
+# (each period divides all larger periods), so that the hyperperiod
+# equals the largest period. Rounding down only makes packets more
+# frequent than required, so a schedule built for harmonized periods
+# can serve the original ones, which checkOriginalPeriods verifies.
+
+# returns the tolerance of a given flow, the fraction of its period
+# that can be cut off. Flows may declare their own `period_tolerance`
+def getTolerance(flow, tolerance):
+  if flow.get("tolerance") != None:
+    return flow["tolerance"]
+  return tolerance
+
+# builds a harmonic chain starting at the given base period. Flows
+# must be sorted by period. Each period is rounded down to the largest
+# multiple of the previous harmonized period. Returns None if any flow
+# falls out of its tolerance
+def harmonicChain(base, flows, tolerance):
+  chain = []
+  prev = base
+  for f in flows:
+    h = prev * (f["period"] // prev)
+    if h == 0 or f["period"] - h > getTolerance(f, tolerance) * f["period"]:
+      return None
+    chain.append(h)
+    prev = h
+  return chain
+
+# candidates for the smallest harmonized period: integer fractions of
+# any period that fall within the tolerance of the smallest period
+def getBaseCandidates(flows, tolerance):
+  pmin = flows[0]["period"]
+  lo = max(1, pmin - int(getTolerance(flows[0], tolerance) * pmin))
+
+  candidates = set([pmin])
+  for f in flows:
+    p = f["period"]
+    for m in range(max(1, p // pmin), p // lo + 1):
+      if lo <= p // m <= pmin:
+        candidates.add(p // m)
+  return candidates
+
+# harmonizes the periods of the given flows. Returns a new list of
+# flows (original flows are left untouched) whose periods form a
+# harmonic set, choosing the set that yields the fewest packets per
+# hyperperiod. Deadlines are kept, unless larger than the harmonized
+# period, as the model requires packets to finish within their period.
+# Returns None if no harmonic set fits the tolerance
+def harmonizeFlows(flows, tolerance):
+  sflows = sorted(flows, key=lambda x : x["period"])
+
+  best = None
+  bestCount = None
+  for base in sorted(getBaseCandidates(sflows, tolerance), reverse=True):
+    chain = harmonicChain(base, sflows, tolerance)
+    if chain == None:
+      continue
+    count = countPackets(chain, chain[-1])
+    if best == None or count < bestCount:
+      best = chain
+      bestCount = count
+
+  if best == None:
+    return None
+
+  harmonized = {}
+  for i in range(0, len(sflows)):
+    harmonized[sflows[i]["name"]] = best[i]
+
+  hflows = []
+  for f in flows:
+    h = dict(f)
+    h["period"] = harmonized[f["name"]]
+    h["deadline"] = min(f["deadline"], h["period"])
+    h["original_period"] = f["period"]
+    h["original_deadline"] = f["deadline"]
+    hflows.append(h)
+
+  return hflows
+
+# summarizes the effect of harmonization as a tuple (original hp,
+# harmonized hp, original packets, harmonized packets). The original
+# hyperperiod (and packets) is None if it overflows
+def harmonizeReport(flows, hflows):
+  operiods = [f["period"] for f in flows]
+  hperiods = [f["period"] for f in hflows]
+  ohp = hyperperiod(operiods)
+  hhp = hyperperiod(hperiods)
+  opackets = None if ohp == None else countPackets(operiods, ohp)
+  return (ohp, hhp, opackets, countPackets(hperiods, hhp))
+
+# checks a schedule built for harmonized periods against the original
+# ones. Every instance of an original flow released at k * period must
+# be served by some packet of that flow released no earlier than the
+# instance and delivered before the original deadline. The schedule
+# repeats every hp cycles, so instances are checked at their distinct
+# releases modulo hp, the multiples of gcd(period, hp). Returns a list
+# of (flow, instance release modulo hp) for instances that are not
+# served
+def checkOriginalPeriods(schedule, flows, hp):
+  byflow = {}
+  for p in schedule:
+    if not p["flow"] in byflow:
+      byflow[p["flow"]] = []
+    byflow[p["flow"]].append((p["release"], p["release"] + p["net_time"]))
+
+  violations = []
+  for f in flows:
+    served = sorted(byflow.get(f["name"], []))
+
+    # next iteration of the schedule, for instances close to hp
+    served = served + [(r + hp, e + hp) for r, e in served]
+
+    releases = [r for r, e in served]
+
+    # packets of a flow have the same net_time, thus the first packet
+    # released after the instance is also the first to be delivered
+    for release in range(0, hp, gcd(f["period"], hp)):
+      i = bisect_left(releases, release)
+      if i == len(served) or served[i][1] > release + f["deadline"]:
+        violations.append((f["name"], release))
+
+  return violations
@@ -0,0 +1,81 @@
+import json
+import os
+import os.path
+from os import path
+
+# Incremental re-solving. Every schedule is saved along with the flows
+# it was built for. When solving again, packets of flows that did not
+# change keep their previous release times, and only packets of changed
+# flows (and packets sharing links with them) are given to the solver.
+
+# summary of a flow, as far as the schedule is concerned. Flows with
+# equal summaries produce the same packets on the same links
+def getFlowSummary(flow, route):
+  return {
+    'period' : flow['period'],
+    'deadline' : flow['deadline'],
+    'datasize' : flow['datasize'],
+    'net_time' : route['net_time'],
+    'path' : [l['data']['label'] for l in route['path']]
+  }
+
+# saves a schedule (see pktgen.py) into the given file, along
+# with the summaries of the flows it was built for
+def saveSchedule(filename, schedule, flows, routes, hp):
+  os.makedirs(os.path.dirname(filename), exist_ok=True)
+  data = {
+    'hp' : hp,
+    'flows' : dict([(f['name'], getFlowSummary(f, routes[f['name']])) for f in flows]),
+    'releases' : dict([(s['name'], int(s['release'])) for s in schedule])
+  }
+  tmpfile = filename + '.' + str(os.getpid()) + '.tmp'
+  with open(tmpfile, 'w') as file:
+    json.dump(data, file)
+  os.replace(tmpfile, filename)
+
+# loads a previously saved schedule, returns None if there is none
+def loadSchedule(filename):
+  if not path.exists(filename):
+    return None
+  try:
+    with open(filename) as file:
+      return json.load(file)
+  except (OSError, ValueError):
+    return None
+
+# returns the names of flows that changed (or are new) since
+# the previous schedule was built
+def getChangedFlows(previous, flows, routes):
+  changed = set()
+  for f in flows:
+    old = previous['flows'].get(f['name'])
+    if old != getFlowSummary(f, routes[f['name']]):
+      changed.add(f['name'])
+  return changed
+
+# returns the previous release time of each packet (None for packets
+# of changed flows, or packets that were not scheduled before)
+def getPreviousReleases(previous, packets, changed):
+  releases = []
+  for p in packets:
+    if p['flow'] in changed:
+      releases.append(None)
+    else:
+      releases.append(previous['releases'].get(p['name']))
+  return releases
+
+# returns the indexes of packets that must be solved again: packets
+# with no previous release time, and packets sharing a link with them
+# (see linktable.py). The latter are returned apart, as they can keep
+# their release times if still valid. Returns (free, neighbours)
+def getAffectedPackets(table, releases):
+  free = set([i for i in range(0, len(releases)) if releases[i] == None])
+
+  rowptr = table['rowptr']
+  neighbours = set()
+  for l in range(0, len(table['labels'])):
+    pkts = table['packet'][rowptr[l]:rowptr[l + 1]].tolist()
+    if any([p in free for p in pkts]):
+      neighbours.update([p for p in pkts if not p in free])
+
+  return free, neighbours
@@ -1,39 +1,35 @@
-#least common multiplier
-def lcm(integers):
+from math import gcd
 
-  # start de algorithm with current integer values
-  tmpsum = [0] * len(integers)
+# largest value a hyperperiod may take. Solvers (e.g. Gecode) represent
+# integers with 32 bits, and the model adds occupancy to release times,
+# so the hyperperiod must stay well below the 32-bit limit
+MAX_HYPERPERIOD = 2**30
 
-  j = 0
+#least common multiplier
+def lcm(integers):
+  res = 1
   for i in integers:
-    tmpsum[j] = i
-    j = j + 1
-
-  while True:
-    # check whether all numbers are the same
-    last = tmpsum[0]
-    done = True
-    for i in tmpsum:
-      if i != last:
-        done = False
-        break;
-
-    # abandon algorithm if all elements are equals
-    if done:
-      return tmpsum[0]
-
-    # scan for the least value in the list 
-    least = tmpsum[0]
-    j = 0
-    k = 0
-    for i in tmpsum:
-      if i < least:
-        least = i
-        k = j
-      j = j + 1
-
-    # increment it by the initial value
-    tmpsum[k] = tmpsum[k] + integers[k]
+    res = res * i // gcd(res, i)
+  return res
+
+# calculates the hyperperiod (lcm) of the given periods, reducing one
+# period at a time. Returns None as soon as the hyperperiod exceeds
+# the given limit, so that large sets abort before growing further
+def hyperperiod(periods, limit=MAX_HYPERPERIOD):
+  hp = 1
+  for p in periods:
+    hp = hp * p // gcd(hp, p)
+    if hp > limit:
+      return None
+  return hp
+
+# number of packets generated for the given periods within the
+# hyperperiod hp (one packet per period, see getPacketsFromFlows)
+def countPackets(periods, hp):
+  count = 0
+  for p in periods:
+    count = count + (hp + p - 1) // p
+  return count
 
 def test_lcm():
   integers = [1,2,3,4,5]
@@ -43,4 +39,3 @@ def test_lcm():
 # Automatically jumps to main if called from command line
 if __name__ == "__main__":
   test_lcm()
-
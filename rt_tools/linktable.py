@@ -0,0 +1,122 @@
+import numpy as np
+
+# Sparse representation of the link-by-packet matrices (occupancy,
+# min_start and deadline). Only cells of links traversed by a packet
+# are stored, as (link, packet, value) triples sorted by link and then
+# by packet. Rows are located through `rowptr`, as in CSR matrices:
+# entries of link i lie within rowptr[i]:rowptr[i+1]. Missing cells
+# read as -1, as in the minizinc model.
+
+# fields stored per cell
+FIELDS = ["occupancy", "min_start", "deadline"]
+
+# builds a sparse link table for the given packets
+# inputs
+#   @packets : list of packets, each one with a path and timing info
+#   @nlinks : list of (source, target, data) of every link in the network
+# outputs
+#   @table : a dictionary containing link labels, num_packets, rowptr,
+#            and one array per cell field (link, packet, FIELDS)
+def buildLinkTable(packets, nlinks):
+  labels = []
+  index = {}
+  for l in nlinks:
+    s, t, d = l
+    index[d['label']] = len(labels)
+    labels.append(d['label'])
+
+  links = []
+  pkts = []
+  occupancy = []
+  min_start = []
+  deadline = []
+  for i in range(0, len(packets)):
+    p = packets[i]
+    for l in p['path']:
+      links.append(index[l['data']['label']])
+      pkts.append(i)
+      occupancy.append(p['net_time'])
+      min_start.append(p['min_start'])
+      deadline.append(p['abs_deadline'])
+
+  link = np.array(links, dtype=np.int32)
+  packet = np.array(pkts, dtype=np.int32)
+  order = np.lexsort((packet, link))
+
+  table = {
+    'labels' : labels,
+    'num_packets' : len(packets),
+    'link' : link[order],
+    'packet' : packet[order],
+    'occupancy' : np.array(occupancy, dtype=np.int64)[order],
+    'min_start' : np.array(min_start, dtype=np.int64)[order],
+    'deadline' : np.array(deadline, dtype=np.int64)[order]
+  }
+  table['rowptr'] = np.searchsorted(table['link'], np.arange(len(labels) + 1))
+  return table
+
+# number of links (rows) of the table
+def numLinks(table):
+  return len(table['labels'])
+
+# removes links not used by any packet. Returns the pruned table
+# and the list of labels of removed links
+def pruneUnused(table):
+  used = np.unique(table['link'])
+  mask = np.ones(len(table['labels']), dtype=bool)
+  mask[used] = False
+  removed = [table['labels'][i] for i in np.flatnonzero(mask)]
+
+  pruned = dict(table)
+  pruned['labels'] = [table['labels'][i] for i in used]
+  pruned['link'] = np.searchsorted(used, table['link']).astype(np.int32)
+  pruned['rowptr'] = np.searchsorted(pruned['link'], np.arange(len(used) + 1))
+  return pruned, removed
+
+# returns the dense row (one value per packet, -1 for packets not
+# using the link) of the given field for the i-th link
+def getRow(table, field, i):
+  row = np.full(table['num_packets'], -1, dtype=np.int64)
+  a = table['rowptr'][i]
+  b = table['rowptr'][i + 1]
+  row[table['packet'][a:b]] = table[field][a:b]
+  return row
+
+# iterates over the dense rows of a given field, yields (label, row)
+def iterRows(table, field):
+  for i in range(0, numLinks(table)):
+    yield table['labels'][i], getRow(table, field, i)
+
+# maximum value of a given field per packet (-1 for packets
+# that use no link). For occupancy, it is the network time
+def maxPerPacket(table, field):
+  res = np.full(table['num_packets'], -1, dtype=np.int64)
+  np.maximum.at(res, table['packet'], table[field])
+  return res
+
+# returns the conflict sets of the table, one per link shared by two or
+# more packets, as a list of (label, sorted packet indexes). Sets equal
+# to or contained in another set are dropped, as non-overlapping within
+# the larger set implies non-overlapping within the smaller one
+def conflictSets(table):
+  rowptr = table['rowptr']
+  sets = []
+  for i in range(0, numLinks(table)):
+    pkts = table['packet'][rowptr[i]:rowptr[i + 1]]
+    if len(pkts) > 1:
+      sets.append((table['labels'][i], frozenset(pkts.tolist())))
+
+  # larger sets first, so that a set is only compared to larger ones
+  sets.sort(key=lambda x : len(x[1]), reverse=True)
+
+  kept = []
+  for l, s in sets:
+    contained = False
+    for kl, ks in kept:
+      if s <= ks:
+        contained = True
+        break
+    if not contained:
+      kept.append((l, s))
+
+  return [(l, sorted(s)) for l, s in kept]
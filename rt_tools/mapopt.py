@@ -0,0 +1,312 @@
+import sys
+import os
+import os.path
+import math
+import random
+import networkx as nx
+import numpy as np
+from os import path
+from concurrent.futures import ProcessPoolExecutor
+from terminal import info, warn, error
+from topology import compileTopology
+from routing import compileRoutes, getNumFlits, getRoutingTime
+from lcm import hyperperiod, countPackets
+from linktable import buildLinkTable, pruneUnused
+from greedy import greedySchedule
+import pktgen
+import batch
+
+# Mapping design-space exploration. Tasks of an application are mapped
+# onto the nodes of an architecture by simulated annealing, with
+# independent chains running in parallel. Mappings are scored by a
+# cheap evaluator: routes are looked up in the precomputed route table
+# (see routing.compileRoutes) for all flows at once, giving the network
+# time of each flow and the utilization of each link. The best few
+# mappings are then checked by greedy scheduling and, optionally, by
+# the exact pipeline (see pktgen.py), and written as .map files.
+
+DSE_CHAINS = None      # number of annealing chains (defaults to the number of cores)
+DSE_STEPS = 20000      # moves per chain
+DSE_STARTS = 64        # random mappings scored to pick the start of each chain
+DSE_T_START = 1.0      # initial temperature
+DSE_T_END = 0.001      # final temperature (cooling is geometric)
+DSE_KEEP = 5           # mappings kept per chain, and written out
+DSE_MAX_TASKS = None   # max tasks per node (defaults to ceil(tasks / nodes))
+DSE_EXACT = True       # run the whole pipeline on the kept mappings
+OVERLOAD_WEIGHT = 10   # cost per unit of link utilization above 1
+MISS_WEIGHT = 10       # cost per flow whose network time exceeds its deadline
+HOP_WEIGHT = 0.01      # cost per average hop
+
+# ranking of exact pipeline outcomes (see batch.py), lower is better
+EXACT_RANK = {'solved' : 0, 'unknown' : 1, 'error' : 1, 'violations' : 2, 'infeasible' : 3, 'unsatisfiable' : 3}
+
+# compiles the application and architecture into arrays: the tasks
+# and nodes (as named in the models), the source and target task of
+# each flow, its period, deadline and number of flits, and the route
+# table of the architecture
+def compileProblem(app, topology):
+  tasks = list(app.nodes())
+  tindex = dict([(tasks[i], i) for i in range(0, len(tasks))])
+  flows = pktgen.extractFlows(app.edges(data=True))
+  nodes = list(topology["nodes"])
+
+  cap = DSE_MAX_TASKS
+  if cap == None:
+    cap = int(math.ceil(len(tasks) / len(nodes)))
+
+  return {
+    'tasks' : tasks,
+    'nodes' : nodes,
+    'flows' : flows,
+    'capacity' : cap,
+    'num_links' : len(topology["nlinks"]),
+    'source' : np.array([tindex[f["source"]] for f in flows], dtype=np.int64),
+    'target' : np.array([tindex[f["target"]] for f in flows], dtype=np.int64),
+    'period' : np.array([f["period"] for f in flows], dtype=np.int64),
+    'deadline' : np.array([f["deadline"] for f in flows], dtype=np.int64),
+    'flits' : np.array([getNumFlits(int(f["datasize"])) for f in flows], dtype=np.int64),
+    'routes' : np.asarray(compileRoutes(topology, pktgen.ROUTES_CACHE), dtype=np.int64)
+  }
+
+# scores a set of mappings (array of node indexes, one row per mapping
+# and one column per task). Returns a dictionary of arrays, one value
+# per mapping, containing the `cost`, the `max_util` of any link, the
+# number of flows missing their deadline (`misses`) and the average
+# number of hops (`hops`), plus the network time of every flow
+# (`net_time`, one row per mapping)
+def evaluate(problem, maps):
+  k = maps.shape[0]
+  nlinks = problem['num_links']
+
+  # links traversed by every flow of every mapping (-1 for none)
+  paths = problem['routes'][maps[:, problem['source']], maps[:, problem['target']]]
+  valid = paths >= 0
+  hops = valid.sum(axis=2) - 2
+  net_time = problem['flits'][None, :] + (hops + 1) * getRoutingTime() + 1
+
+  # packets are one cycle apart, so each takes net_time + 1 cycles of
+  # every link of its path, once per period
+  util = (net_time + 1) / problem['period'][None, :]
+  cells = (np.arange(k)[:, None, None] * nlinks + paths)[valid]
+  weights = np.broadcast_to(util[:, :, None], paths.shape)[valid]
+  load = np.bincount(cells, weights=weights, minlength=k * nlinks).reshape(k, nlinks)
+
+  max_util = load.max(axis=1)
+  overload = np.maximum(load - 1, 0).sum(axis=1)
+  misses = (net_time > problem['deadline'][None, :]).sum(axis=1)
+  avg_hops = hops.mean(axis=1) if hops.shape[1] > 0 else np.zeros(k)
+
+  return {
+    'cost' : max_util + OVERLOAD_WEIGHT * overload + MISS_WEIGHT * misses + HOP_WEIGHT * avg_hops,
+    'max_util' : max_util,
+    'misses' : misses,
+    'hops' : avg_hops,
+    'net_time' : net_time
+  }
+
+# returns a random mapping, with at most `capacity` tasks per node
+def randomMapping(problem, rng):
+  slots = [n for n in range(0, len(problem['nodes'])) for c in range(0, problem['capacity'])]
+  rng.shuffle(slots)
+  return np.array(slots[0:len(problem['tasks'])], dtype=np.int64)
+
+# applies a random move to a mapping: a task moves to another node if
+# it has room, otherwise it swaps places with a task of that node. A
+# single-node architecture has no move, the mapping is kept as is
+def neighbour(problem, m, counts, rng):
+  if len(problem['nodes']) < 2:
+    return m, counts
+  m = m.copy()
+  t = rng.randrange(len(m))
+  n = rng.randrange(len(problem['nodes']) - 1)
+  if n >= m[t]:
+    n = n + 1
+  if counts[n] < problem['capacity']:
+    counts = counts.copy()
+    counts[m[t]] -= 1
+    counts[n] += 1
+    m[t] = n
+  else:
+    others = np.flatnonzero(m == n)
+    u = others[rng.randrange(len(others))]
+    m[u] = m[t]
+    m[t] = n
+  return m, counts
+
+# runs a simulated annealing chain. Returns the best `keep` mappings it
+# visited, as a list of (cost, mapping) sorted by cost
+def anneal(problem, steps, keep, seed):
+  rng = random.Random(seed)
+  nnodes = len(problem['nodes'])
+
+  # start from the best of a few random mappings, scored at once
+  starts = np.array([randomMapping(problem, rng) for i in range(0, DSE_STARTS)])
+  costs = evaluate(problem, starts)['cost']
+  m = starts[int(np.argmin(costs))]
+  cost = float(costs.min())
+  counts = np.bincount(m, minlength=nnodes)
+
+  best = {tuple(m.tolist()) : cost}
+  alpha = (DSE_T_END / DSE_T_START) ** (1.0 / max(1, steps))
+  temp = DSE_T_START
+  for s in range(0, steps):
+    c, ccounts = neighbour(problem, m, counts, rng)
+    ccost = float(evaluate(problem, c[None, :])['cost'][0])
+    if ccost <= cost or rng.random() < math.exp((cost - ccost) / temp):
+      m, counts, cost = c, ccounts, ccost
+      key = tuple(m.tolist())
+      if not key in best and (len(best) < keep or cost < max(best.values())):
+        best[key] = cost
+        if len(best) > keep:
+          del best[max(best, key=best.get)]
+    temp = temp * alpha
+
+  return sorted([(c, np.array(k)) for k, c in best.items()], key=lambda x : x[0])
+
+# returns the mapping as expected by getMap (see mapping.parseMap)
+def toEntries(problem, m):
+  entries = []
+  for n in range(0, len(problem['nodes'])):
+    tasks = [problem['tasks'][t] for t in np.flatnonzero(m == n).tolist()]
+    if len(tasks) > 0:
+      entries.append({"node" : problem['nodes'][n], "tasks" : tasks})
+  return entries
+
+# writes a mapping in the format read by mapping.parseMap
+def writeMap(filename, problem, m):
+  with open(filename, "w+") as file:
+    for e in toEntries(problem, m):
+      file.write(str(e["node"]) + ":" + ",".join(e["tasks"]) + "\n")
+
+# schedules the packets of a mapping with the greedy list scheduler
+# (see greedy.py). Returns the number of packets left out, or None if
+# the hyperperiod or the number of packets is too large
+def getUnplaced(problem, topology, m, net_time):
+  flows = problem['flows']
+  periods = [f["period"] for f in flows]
+  hp = hyperperiod(periods)
+  if hp == None or countPackets(periods, hp) > pktgen.PACKET_BUDGET:
+    return None
+
+  packets = pktgen.getPacketsFromFlows(flows, hp)
+  routes = pktgen.getFlowRoutes(flows, toEntries(problem, m), topology)
+  for f in range(0, len(flows)):
+    routes[flows[f]["name"]]["net_time"] = int(net_time[f])
+  for p in packets:
+    p['path'] = routes[p["flow"]]['path']
+    p['net_time'] = routes[p["flow"]]['net_time']
+
+  table, to_remove = pruneUnused(buildLinkTable(packets, topology['nlinks']))
+  releases, unplaced = greedySchedule(packets, table, hp, pktgen.GREEDY_ORDERING)
+  return len(unplaced)
+
+# runs the exact pipeline (see batch.py) on the given mapping files.
+# Returns the status of each run
+def runExact(appfile, archfile, mapfiles, outdir):
+  jobs = [{'index' : i, 'app' : appfile, 'map' : mapfiles[i], 'arch' : archfile, 'mode' : 'pkt'}
+    for i in range(0, len(mapfiles))]
+  workers = max(1, min(os.cpu_count(), len(jobs)))
+  threads = max(1, os.cpu_count() // workers)
+
+  with ProcessPoolExecutor(max_workers=workers) as pool:
+    futures = [pool.submit(batch.runJob, j, batch.makeRunDir(outdir, j), threads) for j in jobs]
+    return [f.result().get('status', 'error') for f in futures]
+
+# explores mappings of the given application onto the given
+# architecture, and writes the best ones to outdir as
+# <app>-ONTO-<arch>-dse<rank>.map. Returns the list of candidates
+# (mapping, cost, max_util, unplaced packets, exact status), best first
+def mapOpt(appfile, archfile, outdir):
+
+  if not path.exists(appfile):
+    error("Could not read application file")
+    exit(1)
+
+  if not path.exists(archfile):
+    error("Could not read architecture file")
+    exit(1)
+
+  info("Reading `" + appfile + "`")
+  app = nx.read_gml(appfile)
+  info("Reading `" + archfile + "`")
+  topology = compileTopology(nx.read_gml(archfile))
+  problem = compileProblem(app, topology)
+
+  if len(problem['tasks']) > len(problem['nodes']) * problem['capacity']:
+    error("Cannot map " + str(len(problem['tasks'])) + " tasks onto " + str(len(problem['nodes'])) +
+      " nodes of " + str(problem['capacity']) + " tasks")
+    exit(1)
+
+  chains = DSE_CHAINS
+  if chains == None:
+    chains = os.cpu_count()
+
+  info("Annealing " + str(len(problem['tasks'])) + " tasks onto " + str(len(problem['nodes'])) +
+    " nodes (" + str(chains) + " chains of " + str(DSE_STEPS) + " moves)...")
+  found = {}
+  with ProcessPoolExecutor(max_workers=chains) as pool:
+    futures = [pool.submit(anneal, problem, DSE_STEPS, DSE_KEEP, seed) for seed in range(0, chains)]
+    for f in futures:
+      for cost, m in f.result():
+        found[tuple(m.tolist())] = cost
+
+  keys = sorted(found, key=found.get)[0:DSE_KEEP]
+  maps = np.array(keys, dtype=np.int64)
+  scores = evaluate(problem, maps)
+
+  info("Scheduling the best " + str(len(keys)) + " mappings greedily...")
+  candidates = []
+  for i in range(0, len(keys)):
+    candidates.append({
+      'mapping' : maps[i],
+      'cost' : float(scores['cost'][i]),
+      'max_util' : float(scores['max_util'][i]),
+      'unplaced' : getUnplaced(problem, topology, maps[i], scores['net_time'][i]),
+      'status' : None
+    })
+
+  appname = appfile.split('/')[-1].split('.')[0]
+  archname = archfile.split('/')[-1].split('.')[0]
+  outdir = os.path.abspath(outdir)
+  os.makedirs(outdir, exist_ok=True)
+
+  if DSE_EXACT == True:
+    info("Solving the best " + str(len(keys)) + " mappings...")
+    exactdir = outdir + "/exact"
+    os.makedirs(exactdir, exist_ok=True)
+    mapfiles = []
+    for i in range(0, len(candidates)):
+      mapfiles.append(exactdir + "/candidate" + str(i) + ".map")
+      writeMap(mapfiles[-1], problem, candidates[i]['mapping'])
+    for c, status in zip(candidates, runExact(os.path.abspath(appfile), os.path.abspath(archfile), mapfiles, exactdir)):
+      c['status'] = status
+
+  # exact outcome first (if any), then greedy schedulability, then cost
+  candidates.sort(key=lambda c : (EXACT_RANK.get(c['status'], 1),
+    c['unplaced'] if c['unplaced'] != None else math.inf, c['cost']))
+
+  for i in range(0, len(candidates)):
+    c = candidates[i]
+    mapfile = outdir + "/" + appname + "-ONTO-" + archname + "-dse" + str(i) + ".map"
+    writeMap(mapfile, problem, c['mapping'])
+    info("... `" + mapfile + "`: cost=" + ('%.4f' % c['cost']) + " max_util=" + ('%.4f' % c['max_util']) +
+      " unplaced=" + ("?" if c['unplaced'] == None else str(c['unplaced'])) +
+      ("" if c['status'] == None else " exact=" + c['status']))
+
+  if len(candidates) > 0 and candidates[0]['status'] != None and candidates[0]['status'] != 'solved':
+    warn("No mapping was solved by the exact pipeline")
+
+  info("All done.")
+  return candidates
+
+def main():
+  if len(sys.argv) != 4:
+    print("usage:")
+    print("  python3 " + sys.argv[0] + " <app.gml> <noc.gml> <outdir>")
+    exit(0)
+
+  mapOpt(sys.argv[1], sys.argv[2], sys.argv[3])
+
+# Automatically jumps to main if called from command line
+if __name__ == "__main__":
+  main()
@@ -1,45 +1,9 @@
 import json
 from terminal import colors, wsfill
+from parseznc import readznc
 
 DEBUG = False
 
-# 
-def formatLine(line):
-  charBuffer = []
-  items = []
-
-  for c in line:
-    if(c == ' ' or c == '\t' or c == '\n'):
-      if len(charBuffer) > 0:
-        item = int(''.join(charBuffer))
-        items.append(item)
-        charBuffer = []
-    else:
-      charBuffer.append(c)
-
-  return items
-
-# parse data from minizinc result log
-def znc2csv (infile):
-
-  firstLine = True
-  rows = []
-
-  with open(infile) as f:
-
-    for line in f:
-      if firstLine:
-        rows = formatLine(line)
-        firstLine = False
-      else:
-        column = formatLine(line)
-        for i in range(0, len(column)):
-          if column[i] != -1:
-            if rows[i] == -1 or rows[i] > column[i]:
-              rows[i] = column[i]
-    
-  return rows
-
 def merge(pkts, znc):
   packets = []
   release = None
@@ -51,7 +15,7 @@ def merge(pkts, znc):
       packets.append(json.loads(l))
 
   # loads data from minizinc results 
-  release = znc2csv(znc)
+  release = readznc(znc)
 
   # CHECK - compare size of lists; there must be
   # one release time per packet
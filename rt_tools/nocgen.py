@@ -5,12 +5,28 @@ from routing import decodeNodeID
 def getNodeId(x, y, h, w):
   return x + y * w
 
-# generate and save a XY noc arch into the given path
-def nocgen(x, y, output):
+# generates a pair of edges (both directions) between two nodes
+def genEdges(lnode, rnode):
+  gml =       "  edge [\n"
+  gml = gml + "    source " + str(lnode) + "\n"
+  gml = gml + "    target " + str(rnode) + "\n"
+  gml = gml + "    label \"" + (str(lnode) + "-" + str(rnode)) + "\"\n"
+  gml = gml + "  ]\n"
+
+  gml = gml + "  edge [\n"
+  gml = gml + "    source " + str(rnode) + "\n"
+  gml = gml + "    target " + str(lnode) + "\n"
+  gml = gml + "    label \"" + (str(rnode) + "-" + str(lnode)) + "\"\n"
+  gml = gml + "  ]\n"
+  return gml
+
+# generate and save a noc arch into the given path. Torus routing
+# algorithms (see routing.ROUTING_ALGORITHMS) also add wraparound links
+def nocgen(x, y, output, routing_algorithm="XY"):
 
   gml =       "graph [\n";
   gml = gml + "  directed 1\n";
-  gml = gml + "  routing_algorithm \"XY\"\n";
+  gml = gml + "  routing_algorithm \"" + routing_algorithm + "\"\n";
 
   # add nodes to the model
   num_nodes = x * y
@@ -67,6 +83,15 @@ def nocgen(x, y, output):
 
       #print(lnode, "-", rnode)
 
+  # add wraparound paths to the model (torus only)
+  if routing_algorithm.startswith("TORUS"):
+    if x > 2:
+      for row in range(y):
+        gml = gml + genEdges(row * x + x - 1, row * x)
+    if y > 2:
+      for column in range(x):
+        gml = gml + genEdges((y - 1) * x + column, column)
+
   gml = gml + "]";
 
   with open(output, "w") as text_file:
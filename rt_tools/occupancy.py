@@ -2,19 +2,23 @@ import networkx as nx
 import sys
 import os.path
 from os import path
+from lcm import hyperperiod, MAX_HYPERPERIOD
+from terminal import error
 import mapping
 from mapping import parseMap
 from mapping import getMap
 import routing
-from routing import XY
+from routing import getRoute
 from routing import getNumFlits
 from routing import manhattan
 from routing import getRoutingTime
+from topology import compileTopology, LOCAL_PORT
 
 def generateHyperperiod(flows):
-  return 78651
-  # 1) collect all periods
-  # 2) return math.lcm()
+  periods = []
+  for f in flows:
+    periods.append(f["period"])
+  return hyperperiod(periods)
 
 def mcopy(matin):
   m = []
@@ -41,6 +45,7 @@ def generateOccupancy(appfile, mapfile, archfile):
     exit(0)
 
   arch = nx.read_gml(archfile) # read topology file (architecture)
+  topology = compileTopology(arch)
   mapping = parseMap(mapfile)  # read mapping file (node-to-tasks)
   app = nx.read_gml(appfile)   # read application model
   
@@ -67,37 +72,35 @@ def generateOccupancy(appfile, mapfile, archfile):
   # for each flow, get paths 
   fpaths = []
   for f in flows:
-    fpath = XY(mapp[f["source"]], mapp[f["target"]], arch)
+    fpath = getRoute(mapp[f["source"]], mapp[f["target"]], topology)
     fpaths.append(fpath)
 
-  # enumerate network links
+  # enumerate network links (node-to-node only), indexed by label
   nlinks = []
-  for e in arch.edges.items():
-    nlinks.append(e)
+  lindex = {}
+  for l in topology["nlinks"]:
+    s, t, d = l
+    if s != LOCAL_PORT and t != LOCAL_PORT:
+      lindex[d["label"]] = len(nlinks)
+      nlinks.append(((s, t), d))
 
   # generate occupancy matrix
   occupancy = [[0 for j in range(len(fpaths))] for i in range(len(nlinks))]
 
   ic = 0
-  kc = 0
   OCCUPANCY_MARK = 'x'
 
   # fill occupancy for node-to-node links
   for i in fpaths:  
     for j in i:
-      dj = j["data"]
-      ik = 0
-      for k in nlinks:
-        ek, dk = k
-        if dj["label"] == dk["label"]:
-          occupancy[ik][ic] = OCCUPANCY_MARK
-        ik += 1
+      ik = lindex.get(j["data"]["label"])
+      if ik != None:
+        occupancy[ik][ic] = OCCUPANCY_MARK
     ic += 1
 
   # fill occupancy for node-to-pe and pe-to-node links
   i = len(nlinks)
-  for node in arch.nodes.items():
-    n, d = node
+  for n in topology["nodes"]:
     nlinks.append([(n, 'L'), {'label': n + "-L"}])
     nlinks.append([('L', n), {'label': "L-" + n}])
     occupancy.append([0 for j in range(len(fpaths))])
@@ -140,7 +143,7 @@ def generateOccupancy(appfile, mapfile, archfile):
         source = getMap(f["source"], mapping)
         target = getMap(f["target"], mapping)
         occupancy[i][j] = ((getNumFlits(f["datasize"]) -1) +
-          manhattan(source, target, arch) * getRoutingTime()) 
+          manhattan(source, target, topology) * getRoutingTime()) 
       j += 1
     i += 1
 
@@ -197,6 +200,9 @@ def generateOccupancy(appfile, mapfile, archfile):
   # variables
   print()
   hyperperiod = generateHyperperiod(flows)
+  if hyperperiod == None:
+    error("Hyperperiod for the entered flow set exceeds " + str(MAX_HYPERPERIOD) + ", aborting")
+    exit(1)
   print("hyperperiod_length = ", hyperperiod, ";")
   print("num_links = ", len(nlinks), ";")
   print("num_packets = ", len(flows),  ";")
@@ -1,53 +1,77 @@
 import sys
+import json
 import os.path
 from os import path
+import numpy as np
+from solver import SOLUTION_SEPARATOR
 
-# Extracts one line from the parsed CSV matrix 
-# while removing whitespaces, linebreaks and tabs
-def formatLine(line):
-  charBuffer = []
-  items = []
+# Reader of minizinc results. Release times are printed either as rows
+# of integers (one row per link, one column per packet, -1 for packets
+# not using the link) or, in minizinc's json output mode, as one object
+# per solution. Solutions are followed by a `----------` line.
 
-  for c in line:
-    if(c == ' ' or c == '\t' or c == '\n'):
-      if len(charBuffer) > 0:
-        item = int(''.join(charBuffer))
-        items.append(item)
-        charBuffer = []
-    else:
-      charBuffer.append(c)
+# splits minizinc output into solutions, returns the lines of the last
+# complete solution (or all lines if no separator is found). Status
+# (=====...) and comment (%...) lines are dropped
+def getSolutionLines(input):
+  solution = []
+  last = None
+  for line in input.split('\n'):
+    s = line.strip()
+    if s == SOLUTION_SEPARATOR:
+      last = solution
+      solution = []
+    elif len(s) > 0 and not s.startswith('=') and not s.startswith('%'):
+      solution.append(s)
+  return last if last != None else solution
 
-  if len(charBuffer) > 0:
-    item = int(''.join(charBuffer))
-    items.append(item) #prevent last element from being skipped
+# returns the first array found in a json solution, as a list of rows
+def getJsonRows(lines):
+  data = json.loads('\n'.join(lines))
+  for k in data:
+    v = data[k]
+    if isinstance(v, list):
+      return v if len(v) > 0 and isinstance(v[0], list) else [v]
+  return []
 
-  return items
+# parses the last solution of minizinc output into a 2d array of
+# integers (a single row for one-dimensional outputs)
+def parseMatrix(input):
+  lines = getSolutionLines(input)
+  if len(lines) == 0:
+    return np.zeros((0, 0), dtype=np.int64)
+
+  if lines[0].startswith('{'):
+    return np.array(getJsonRows(lines), dtype=np.int64)
+
+  # all rows are parsed at once, rows must have the same length
+  values = np.fromstring(' '.join(lines), dtype=np.int64, sep=' ')
+  ncols = len(lines[0].split())
+  if ncols == 0 or len(values) % ncols != 0:
+    raise ValueError("rows of minizinc output differ in length")
+  return values.reshape(-1, ncols)
+
+# column-wise minimum of a matrix, ignoring -1 cells. Columns
+# with no other value than -1 are -1
+def minPerColumn(matrix):
+  if matrix.shape[0] == 0:
+    return matrix.reshape(-1)
+  masked = np.where(matrix == -1, np.iinfo(np.int64).max, matrix)
+  res = masked.min(axis=0)
+  res[res == np.iinfo(np.int64).max] = -1
+  return res
 
 # parse results from minizinc and scan 
 # for the minimum release time among the
 # the resources used by each packet. The
 # result is a vector of `release_time`
 def parseznc(input):
+  return minPerColumn(parseMatrix(input)).tolist()
 
-  firstLine = True
-  max = []
-
-  lines = input.split('\n')
-  for line in lines:
-
-    if not line.startswith("--") and len(line) > 1:
-      row = formatLine(line)
-      
-      if firstLine:
-        max = row
-        firstLine = False
-      else:    
-        for i in range(0, len(row)):
-          if row[i] != -1:
-            if max[i] == -1 or max[i] > row[i]:
-              max[i] = row[i]
-
-  return max
+# reads minizinc results from a file, see parseznc
+def readznc(filename):
+  with open(filename) as file:
+    return parseznc(file.read())
 
 
 # get network time from max occupancy
@@ -67,4 +91,4 @@ def parseoccup(occupancy):
       for i in range(0, len(row)):
         if row[i] > max[i]:
           max[i] = row[i]
-  return max
\ No newline at end of file
+  return max
@@ -1,30 +1,67 @@
-from asyncio import subprocess
 import networkx as nx
 import json
 from os import path
 import os.path
+import time
 from mapping import parseMap
 from mapping import getMap
-from routing import XY
+from routing import getRoute, getHops, compileRoutes
 from routing import getNumFlits
-from routing import manhattan
 from routing import getRoutingTime
-from lcm import lcm
-from terminal import info, wsfill, error, debug
+from topology import compileTopology
+from lcm import hyperperiod, countPackets, MAX_HYPERPERIOD
+from harmonize import harmonizeFlows, harmonizeReport, checkOriginalPeriods
+from terminal import info, error, debug, warn
 from exports import printSched, exportGraphImage
-from parseznc import parseznc, parseoccup
+from parseznc import parseznc
+from dzn import writeDzn, writeCompactDzn, writeFlowDzn
+from linktable import buildLinkTable, pruneUnused, iterRows, numLinks, maxPerPacket, FIELDS
 from vhdl import generateVhdlSimInput
-import subprocess
+from solver import checkMinizinc, runMinizinc, isUnsatisfiable, isFinal, getPortfolio, runPortfolio
+from cache import getCacheKey, loadResult, storeResult
+from decompose import getComponents, solveComponents
+from flowlevel import getFlowConflicts, expandOffsets, findConflicts, fixPackets
+from pysolver import searchPython
+from greedy import greedySchedule
+from verify import verifySchedule
+from feasibility import checkFeasibility
+from rta import analyzeFlows
+from incremental import saveSchedule, loadSchedule, getChangedFlows, getPreviousReleases, getAffectedPackets
 
 DEBUG = True
-ZINC_APP   = 'minizinc'
 #ZINC_MODEL  = '../minizinc/CM/CM-v20211013.mzn'
 #ZINC_MODEL  = '../minizinc/CM/CM-v20220427.mzn'
 ZINC_MODEL  = '../minizinc/CM/CM-v20220518.mzn'
+ZINC_COMPACT_MODEL = '../minizinc/CM/CM-compact-v20261018.mzn'
+ZINC_EXPORT = 'matrix'  # 'matrix' (ZINC_MODEL) or 'compact' (ZINC_COMPACT_MODEL)
+ZINC_FLOW_MODEL = '../minizinc/CM/CM-flow-v20261018.mzn'
+ZINC_STRATEGY = 'packet' # 'packet' (single problem) or 'flow' (flow offsets first)
+ZINC_DECOMPOSE = False   # solve independent packet groups separately
+ZINC_WORKERS = None      # number of parallel sub-solves (defaults to the number of cores)
 ZINC_SOLVER = 'Gecode'
-ZINC_INPUT_PAD = 7
 ZINC_THREADS = 4
+ZINC_PORTFOLIO = None    # solvers to race, e.g. ['gecode', 'chuffed', 'cp-sat', 'coin-bc']
+ZINC_TIME_LIMIT = None   # seconds per solver run (None for no limit)
+ZINC_MEMORY_LIMIT = None # megabytes per solver process (None for no limit)
+GREEDY = False           # try greedy list scheduling before solving
+GREEDY_ORDERING = 'edf'  # greedy priority: 'edf' or 'lstf'
+SOLVER_BACKEND = 'minizinc' # 'minizinc' or 'python' (rt_tools_pybackend, packet level only)
+PY_ORDERING = 'edf'      # python backend variable ordering: 'slack', 'edf', 'link' or 'wdeg'
+PY_RESTARTS = True       # python backend luby restarts
+PY_WORKERS = 1           # python backend processes (None for one per core)
+ZINC_CACHE = os.path.dirname(os.path.realpath(__file__)) + "/../cache/results/" # None disables caching
 OCCUPANCY_TEMPLATE_PLACEHOLDER = 'X'
+HARMONIZE = False            # round periods down to a harmonic set
+HARMONIZE_TOLERANCE = 0.05   # fraction of the period that can be cut off
+PACKET_BUDGET = 100000       # max number of packets to expand from flows
+PACKET_BUDGET_ABORT = True   # abort if budget is exceeded (warns otherwise)
+PRECHECK = True              # reject instances failing necessary conditions before solving
+VERIFY_REPORT_LIMIT = 20     # violations printed by the schedule verifier
+ROUTES_CACHE = os.path.dirname(os.path.realpath(__file__)) + "/../cache/routes/"
+SCHEDULE_CACHE = os.path.dirname(os.path.realpath(__file__)) + "/../cache/schedules/"
+INCREMENTAL = False          # reuse the previous schedule of unchanged flows
+PLOT = True                  # show the schedule with matplotlib (blocks until closed)
+SIM_LOCATION = os.path.dirname(os.path.realpath(__file__)) + "/../pkt-sim/packets/"
 
 # extract flows from a given application graph edges
 # returns a list of flows
@@ -39,7 +76,8 @@ def extractFlows(edges):
       "target" : target,       # task that will receive the packets (task id)  
       "period" : data["period"],       # packets injection period
       "datasize" : data["datasize"],   # number of bytes to send
-      "deadline" : data["deadline"] }) # deadline
+      "deadline" : data["deadline"],   # deadline
+      "tolerance" : data.get("period_tolerance") }) # period harmonization tolerance (optional)
     flows.append(flow)
 
   # sort flows by label (usually f1, f2, ...)
@@ -47,15 +85,6 @@ def extractFlows(edges):
 
   return flows
 
-# checks whether a vector constains only "-1" values
-def nulline(i):
-  res = True
-  for j in i:
-    if j != -1:
-      res = False
-      break
-  return res
-
 # generates packets for a given list of flows. packets 
 # are generated for the whole hyperperiod hp
 def getPacketsFromFlows(flows, hp):
@@ -76,52 +105,311 @@ def getPacketsFromFlows(flows, hp):
 
   return packets
 
-# returns a matrix whose dimensions are equals to the given matrix
-def mcopy(matin):
-  m = []
-  for i in matin:
-    n = []
-    for j in i:
-      n.append(j)
-    m.append(n)
-  return m
-
-def vcopy(vecin):
-  newvec = []
-  for i in vecin:
-    newvec.append(i)
-  return newvec
-
-def genTable(label, table):
-  
-  lines = []
-  # lines.append(header)
-  lines.append(label + " = ")
-  
-  c = 0
-  first_line = True
-  for i in table:
-    if not nulline(i): ##prints only if non-empty
-      if not first_line:
-        line = " "
-      else:
-        line = "["
-      line = line + "| "
-
-      for j in table[i]:
-        line = line + wsfill(j, 5) + ",   "
-      
-      line = line + "%" + i
-
-      lines.append(line)
-      first_line = False
-    c = c + 1
-  lines.append("|];")
-
-  return '\n'.join(lines, )
-
-# generate a list of packets from models
-def pktGen(appfile, mapfile, archfile):
+# discovers the route of each flow. Routes are computed once per pair
+# of source and target nodes, as flows (and their packets) mapped onto
+# the same nodes traverse the same links. Returns a dictionary indexed
+# by flow name, containing the source and target nodes, the path and
+# the number of router-to-router hops of the flow
+def getFlowRoutes(flows, mapping, topology):
+  memo = {}
+  routes = {}
+  for f in flows:
+    source = getMap(f["source"], mapping)
+    target = getMap(f["target"], mapping)
+
+    if not (source, target) in memo:
+      ppath = getRoute(source, target, topology)
+      memo[(source, target)] = {
+        "source" : source,
+        "target" : target,
+        "path" : ppath,
+        "hops" : getHops(ppath)
+      }
+
+    # routes are copied so that each flow can hold its own net_time
+    routes[f["name"]] = dict(memo[(source, target)])
+
+  return routes
+
+# runs the configured solver for the given model and data file, within
+# the configured limits. If a portfolio is configured, its solvers race
+# and the first answer wins. Returns the solver result (see solver.py)
+def runSolver(model, mzFile):
+  if ZINC_PORTFOLIO == None:
+    return runMinizinc(model, mzFile, ZINC_SOLVER, ZINC_THREADS,
+      timeout=ZINC_TIME_LIMIT, memory=ZINC_MEMORY_LIMIT)
+
+  portfolio = getPortfolio(ZINC_PORTFOLIO, os.cpu_count())
+  if len(portfolio) == 0:
+    warn("... no solver of the portfolio is installed, using " + ZINC_SOLVER)
+    return runMinizinc(model, mzFile, ZINC_SOLVER, ZINC_THREADS,
+      timeout=ZINC_TIME_LIMIT, memory=ZINC_MEMORY_LIMIT)
+
+  solver, result = runPortfolio(model, mzFile, portfolio, ZINC_TIME_LIMIT, ZINC_MEMORY_LIMIT)
+  if solver != None:
+    info("... `" + solver + "` answered first")
+  return result
+
+# solver and options used to solve problems, as part of cache keys.
+# Threads do not change final answers, and are left out so that keys
+# do not depend on the machine (see decompose.py)
+def getSolverOptions():
+  if ZINC_PORTFOLIO != None:
+    return ('portfolio', tuple(ZINC_PORTFOLIO))
+  return (ZINC_SOLVER, None)
+
+# solves the given model and data file. Returns the parsed release
+# vector (None if there is none) and the outcome: 'solved',
+# 'unsatisfiable' (proven by the solver) or 'unknown' (no answer within
+# the limits, or the solver failed). Final results (solutions and
+# unsatisfiable proofs) are cached, see cache.py
+def solve(model, mzFile):
+  if not path.exists(model):
+    error("Could not read minizinc model `" + model + "`")
+    exit(1)
+
+  key = None
+  if ZINC_CACHE != None:
+    key = getCacheKey(mzFile, model, *getSolverOptions())
+    cached = loadResult(ZINC_CACHE, key)
+    if cached != None:
+      info("... found cached result `" + key[:16] + "`, skipping solver")
+      if(DEBUG):
+        debug(cached['output'])
+      return cached['releases'], 'solved' if cached['releases'] != None else 'unsatisfiable'
+
+  info("Invoking Minizinc with...")
+  result = runSolver(model, mzFile)
+  zincres = result['output']
+
+  #TODO: fix print
+  if(DEBUG):
+    debug(zincres)
+
+  releases = None
+  status = 'unknown'
+  if result['status'] == 'SATISFIED':
+    releases = parseznc(zincres)
+    status = 'solved'
+  elif isUnsatisfiable(result):
+    info("... `" + zincres.replace('\n','') + "`")
+    status = 'unsatisfiable'
+  elif result['status'] == 'TIMEOUT':
+    warn("... no solution within " + str(ZINC_TIME_LIMIT) + "s")
+  else:
+    warn("... no answer from the solver (" + result['status'].lower() + ")")
+
+  if key != None and isFinal(result):
+    storeResult(ZINC_CACHE, key, zincres, releases)
+
+  return releases, status
+
+# solves the packet-level problem with the python backend, which
+# reads the link table straight from memory, within ZINC_TIME_LIMIT.
+# Returns the release times and the outcome (see solve): the backend
+# may give up, and only an exhausted search proves there is no solution
+def solvePython(packets, table, hp):
+  info("Searching with the python backend (" + PY_ORDERING + " ordering" +
+    (", restarts" if PY_RESTARTS else "") + ")...")
+  info("... problem size: " + str(len(packets)) + "-by-" + str(numLinks(table)))
+  releases, stats = searchPython(packets, table, hp, PY_WORKERS, PY_ORDERING, PY_RESTARTS,
+    timeout=ZINC_TIME_LIMIT)
+  info("... entered=" + str(stats['entered']) + ", ignored=" + str(stats['ignored']) +
+    ", failures=" + str(stats['failures']) + ", restarts=" + str(stats['restarts']) +
+    (", chronological search" if stats['chrono'] else ""))
+  if stats['status'] == 'unsatisfiable':
+    info("... search exhausted, there is no solution")
+  elif stats['status'] == 'unknown':
+    warn("... search gave up (time or node limit), no solution found")
+  return releases, stats['status']
+
+# solves the packet-level problem for the given packets, writing the
+# minizinc input to mzFile. Returns the release time of each packet
+# (None if there are none) and the outcome (see solve)
+def solvePackets(packets, table, hp, mzFile):
+  if SOLVER_BACKEND == 'python':
+    return solvePython(packets, table, hp)
+
+  info("Generating optimization problem (Minizinc export)...")
+  info("... problem size: " + str(len(packets)) + "-by-" + str(numLinks(table)))
+
+  model = ZINC_COMPACT_MODEL if ZINC_EXPORT == 'compact' else ZINC_MODEL
+
+  # packets that never share links (transitively) are independent
+  if ZINC_DECOMPOSE == True:
+    components = getComponents(table)
+    if len(components) > 1:
+      info("... decomposed into " + str(len(components)) + " independent subproblems (largest has " +
+        str(len(components[0])) + " packets)")
+      if ZINC_PORTFOLIO != None:
+        warn("... subproblems are solved by " + ZINC_SOLVER + " alone, the portfolio is not raced")
+      info("Invoking Minizinc for each subproblem...")
+      releases, status = solveComponents(packets, table, hp, components, mzFile,
+        model, ZINC_EXPORT, ZINC_SOLVER, ZINC_WORKERS, ZINC_CACHE,
+        ZINC_TIME_LIMIT, ZINC_MEMORY_LIMIT)
+      if status == 'unknown':
+        warn("... some subproblems gave no answer")
+      return releases, status
+
+  # write minizinc input to disk
+  info("Writing to `" + mzFile + "`")
+  if ZINC_EXPORT == 'compact':
+    writeCompactDzn(mzFile, hp, packets, table)
+  else:
+    writeDzn(mzFile, hp, table)
+
+  return solve(model, mzFile)
+
+# solves the flow-level problem first (one offset per flow), expands
+# offsets into packets release times, and solves again at the packet
+# level only if some packets are left in conflict. In that case, all
+# other packets are fixed at their release times. Falls back to the
+# whole packet-level problem if flows cannot be strictly periodic, or
+# if the repair finds no solution
+def solveFlowFirst(flows, routes, packets, table, nlinks, hp, mzFile):
+  info("Generating flow-level problem (one offset per flow)...")
+  pairs = getFlowConflicts(flows, routes)
+  info("... problem size: " + str(len(flows)) + " flows, " + str(len(pairs)) + " conflicting pairs")
+
+  fzFile = mzFile.replace('.dzn', '-flows.dzn')
+  info("Writing to `" + fzFile + "`")
+  writeFlowDzn(fzFile, flows, routes, pairs)
+
+  offsets, status = solve(ZINC_FLOW_MODEL, fzFile)
+  if offsets == None:
+    if status == 'unsatisfiable':
+      warn("... flows cannot be released strictly periodically, solving at the packet level")
+    else:
+      warn("... no flow-level answer, solving at the packet level")
+    return solvePackets(packets, table, hp, mzFile)
+
+  releases = expandOffsets(packets, flows, offsets)
+  conflicts = findConflicts(packets, table, releases, hp)
+  if len(conflicts) == 0:
+    info("... expanded " + str(len(packets)) + " packets, no conflicts left")
+    return releases, 'solved'
+
+  info("... expanded " + str(len(packets)) + " packets, repairing " + 
+    str(len(conflicts)) + " packets in conflict")
+  fixed = fixPackets(packets, releases, conflicts)
+  ftable, removed = pruneUnused(buildLinkTable(fixed, nlinks))
+  res, status = solvePackets(fixed, ftable, hp, mzFile)
+  if res == None:
+    # the repair keeps conflict-free packets at their flow offsets,
+    # which may rule out every solution of the full problem
+    warn("... repair failed, solving the whole problem at the packet level")
+    return solvePackets(packets, table, hp, mzFile)
+  return res, status
+
+# schedules packets greedily (see greedy.py). If some packets are left
+# out, they are solved along with the packets sharing links with them,
+# while the other packets keep their greedy release times. Returns None
+# if packets are still left out
+def solveGreedy(packets, table, nlinks, hp, mzFile):
+  info("Scheduling packets greedily (" + GREEDY_ORDERING + ")...")
+  releases, unplaced = greedySchedule(packets, table, hp, GREEDY_ORDERING)
+  if len(unplaced) == 0:
+    info("... all " + str(len(packets)) + " packets placed")
+    return releases
+
+  # packets left out and their neighbours are free, the packets
+  # sharing links with them are fixed at their greedy release times
+  free, neighbours = getAffectedPackets(table, releases)
+  for i in neighbours:
+    releases[i] = None
+  free, ring = getAffectedPackets(table, releases)
+  info("... " + str(len(unplaced)) + " packets left out, solving " + str(len(free)) +
+    " packets with " + str(len(ring)) + " neighbouring packets fixed")
+
+  pkts = sorted(free | ring)
+  fixed = fixPackets(packets, releases, free)
+  sub = [fixed[i] for i in pkts]
+  stable, removed = pruneUnused(buildLinkTable(sub, nlinks))
+  res, status = solvePackets(sub, stable, hp, mzFile.replace('.dzn', '-greedy.dzn'))
+  if res == None:
+    return None
+  for i, r in zip(pkts, res):
+    releases[i] = r
+  return releases
+
+# solves the whole problem with the configured strategy, trying
+# greedy list scheduling first if enabled. Returns the release times
+# and the outcome (see solve)
+def solveAll(flows, routes, packets, table, nlinks, hp, mzFile):
+  if GREEDY == True:
+    releases = solveGreedy(packets, table, nlinks, hp, mzFile)
+    if releases != None:
+      return releases, 'solved'
+    warn("... greedy schedule could not be completed, solving the whole problem")
+
+  if ZINC_STRATEGY == 'flow':
+    return solveFlowFirst(flows, routes, packets, table, nlinks, hp, mzFile)
+  return solvePackets(packets, table, hp, mzFile)
+
+# solves the problem again, starting from a previous schedule (see
+# incremental.py). Packets of unchanged flows keep their release times.
+# Only packets of changed flows and the packets sharing links with them
+# are solved, while the packets sharing links with those are fixed at
+# their release times. Falls back to solving the whole problem if the
+# previous release times cannot be kept
+def solveIncremental(flows, routes, packets, table, nlinks, hp, mzFile, previous):
+  changed = getChangedFlows(previous, flows, routes)
+  releases = getPreviousReleases(previous, packets, changed)
+
+  # packets of changed flows and their neighbours are free, the packets
+  # sharing links with them are fixed at their previous release times
+  free, neighbours = getAffectedPackets(table, releases)
+  for i in neighbours:
+    releases[i] = None
+  free, ring = getAffectedPackets(table, releases)
+  info("... " + str(len(changed)) + " of " + str(len(flows)) + " flows changed, " +
+    str(len(free)) + " packets to schedule, " + str(len(ring)) + " neighbouring packets fixed")
+
+  if len(free) > 0:
+    fixed = fixPackets(packets, releases, free)
+    pkts = sorted(free | ring)
+    sub = [fixed[i] for i in pkts]
+    stable, removed = pruneUnused(buildLinkTable(sub, nlinks))
+    res, status = solvePackets(sub, stable, hp, mzFile.replace('.dzn', '-incr.dzn'))
+    if res == None:
+      warn("... previous release times cannot be kept, solving the whole problem")
+      return solveAll(flows, routes, packets, table, nlinks, hp, mzFile)
+    for i, r in zip(pkts, res):
+      releases[i] = r
+
+  # previous release times may no longer fit (e.g. routing changes)
+  if len(findConflicts(packets, table, releases, hp)) > 0:
+    warn("... previous schedule is no longer valid, solving the whole problem")
+    return solveAll(flows, routes, packets, table, nlinks, hp, mzFile)
+
+  return releases, 'solved'
+
+# starts a run summary (see batch.py): the outcome of the run
+# (`status`), the time taken by each stage (`timings`), and other
+# figures (hp, packets, links) as they become known. A None summary
+# records nothing
+def startSummary(summary):
+  if summary != None:
+    summary['status'] = 'error'
+    summary['timings'] = {}
+    summary['clock'] = time.time()
+
+# records figures of the run into the summary
+def record(summary, **values):
+  if summary != None:
+    summary.update(values)
+
+# records the time taken since the previous stage
+def markStage(summary, stage):
+  if summary != None:
+    now = time.time()
+    summary['timings'][stage] = now - summary['clock']
+    summary['clock'] = now
+
+# reads the application, mapping and architecture models. Returns the
+# application and architecture graphs, the compiled topology and the
+# mapping
+def readModels(appfile, mapfile, archfile):
 
   if not path.exists(appfile):
     error("Could not read application file")
@@ -139,9 +427,81 @@ def pktGen(appfile, mapfile, archfile):
   app = nx.read_gml(appfile)   # read application model
   info("Reading `" + archfile + "`")
   arch = nx.read_gml(archfile) # read topology file (architecture)
+  topology = compileTopology(arch)
   info("Reading `" + mapfile + "`")
   mapping = parseMap(mapfile)  # read mapping file (node-to-tasks)
-  
+
+  return app, arch, topology, mapping
+
+# calculates the networking time of each flow, stored in its route
+def setNetTimes(flows, routes):
+  for f in flows:
+    r = routes[f["name"]]
+    routing_time = (r["hops"] + 1) * getRoutingTime()
+    payload = getNumFlits(int(f["datasize"]))
+    r["net_time"] = payload + routing_time + 1
+
+    if DEBUG == True:
+      debug(f['name'] + "=" + str(r['net_time']) +
+        " dm=" + str(r["hops"]) +
+        " ffrt=" + str(routing_time) +
+        " payload=" + str(payload))
+
+# bounds the worst-case response time of each flow, assuming
+# priority-arbitrated wormhole routers (see rta.py), instead of
+# building a time-triggered schedule. The hyperperiod is not expanded
+def rtaGen(appfile, mapfile, archfile, summary=None):
+  startSummary(summary)
+  app, arch, topology, mapping = readModels(appfile, mapfile, archfile)
+  markStage(summary, 'read')
+
+  flows = extractFlows(app.edges(data=True))
+  for f in flows:
+    if f["period"] <= 0:
+      error("Flow `" + f["name"] + "` has non-positive period " + str(f["period"]))
+      exit(1)
+
+  info("Discovering flows routes (" + topology["routing_algorithm"] + ")...")
+  compileRoutes(topology, ROUTES_CACHE)
+  routes = getFlowRoutes(flows, mapping, topology)
+
+  info("Calculating networking time...")
+  setNetTimes(flows, routes)
+  markStage(summary, 'routes')
+
+  info("Analysing worst-case response times (deadline-monotonic priorities)...")
+  res = analyzeFlows(flows, routes)
+  markStage(summary, 'solve')
+
+  missed = 0
+  for f in flows:
+    a = res[f["name"]]
+    if DEBUG == True:
+      debug(f["name"] + ": direct=" + str(a["direct"]) + " indirect=" + str(a["indirect"]))
+    msg = (f["name"] + " (priority " + str(a["priority"]) + "): C=" + str(a["net_time"]) +
+      " R=" + ("?" if a["response"] == None else str(a["response"])) + " D=" + str(f["deadline"]))
+    if a["response"] == None:
+      missed = missed + 1
+      warn("... " + msg + ", no bound within deadline")
+    else:
+      info("... " + msg)
+
+  if missed == 0:
+    info("... all " + str(len(flows)) + " flows meet their deadlines")
+  else:
+    warn("... " + str(missed) + " of " + str(len(flows)) + " flows may miss their deadlines")
+
+  record(summary, flows=len(flows), status='schedulable' if missed == 0 else 'unschedulable')
+  info("All done.")
+  return res
+
+# generate a list of packets from models. Figures and stage timings of
+# the run are recorded into the given summary, if any
+def pktGen(appfile, mapfile, archfile, summary=None):
+  startSummary(summary)
+  app, arch, topology, mapping = readModels(appfile, mapfile, archfile)
+  markStage(summary, 'read')
+
 
   info("Exporting PNG file for `" + appfile + "`")
   appname = (appfile.split('/')[-1].split('.')[0])
@@ -154,60 +514,79 @@ def pktGen(appfile, mapfile, archfile):
     for f in flows:
       debug(str(f))
 
+  for f in flows:
+    if f["period"] <= 0:
+      error("Flow `" + f["name"] + "` has non-positive period " + str(f["period"]))
+      exit(1)
+
+  # harmonize periods, original flows are kept to check the schedule
+  oflows = flows
+  if HARMONIZE == True:
+    info("Harmonizing flow periods...")
+    hflows = harmonizeFlows(oflows, HARMONIZE_TOLERANCE)
+    if hflows == None:
+      warn("No harmonic period set within tolerance, keeping original periods")
+    else:
+      flows = hflows
+      ohp, hhp, opackets, hpackets = harmonizeReport(oflows, flows)
+      info("... hyperperiod " + str(ohp) + " -> " + str(hhp) +
+        ", packets " + str(opackets) + " -> " + str(hpackets))
+
+      if DEBUG == True:
+        for f in flows:
+          debug(f["name"] + ": period=" + str(f["original_period"]) + " -> " + str(f["period"]) +
+            " deadline=" + str(f["original_deadline"]) + " -> " + str(f["deadline"]))
+
   # calculate hyperperiod
   periods = []
   for f in flows:
     periods.append(f["period"])
 
-  hp = lcm(periods)
+  hp = hyperperiod(periods)
+  if hp == None:
+    error("Hyperperiod for the entered flow set exceeds " + str(MAX_HYPERPERIOD) + ", aborting")
+    exit(1)
+
   info("Hyperperiod for the entered flow set is " + str(hp))
 
+  # check the number of packets before expanding them
+  npackets = countPackets(periods, hp)
+  info("... flow set expands to " + str(npackets) + " packets")
+  if npackets > PACKET_BUDGET:
+    msg = ("Flow set expands to " + str(npackets) + " packets, exceeding the budget of " +
+      str(PACKET_BUDGET) + " packets")
+    if PACKET_BUDGET_ABORT:
+      error(msg + ", aborting")
+      exit(1)
+    warn(msg)
+
   # get packets from flows
   packets = getPacketsFromFlows(flows, hp)
   info("Extracted " + str(len(packets)) + " packets from " + str(len(flows)) + " flows")
+  record(summary, hp=hp, flows=len(flows), packets=len(packets))
+  markStage(summary, 'expand')
 
   if DEBUG == True:
     for p in packets:
       debug(str(p))
 
-  info("Discovering packets routes...")
-
-  # get traversal path of each packet
-  for p in packets:
-    sourceTaskName = ""
-    targetTaskName = ""
+  info("Discovering flows routes (" + topology["routing_algorithm"] + ")...")
+  compileRoutes(topology, ROUTES_CACHE)
 
-    for n in app.nodes(data=True):
-      id, data = n
-      if id == p["source"]:
-        sourceTaskName = id
-      if id == p["target"]:
-        targetTaskName = id
+  # get traversal path of each flow, packets of a flow share the same path
+  routes = getFlowRoutes(flows, mapping, topology)
 
-    sourceNode = getMap(sourceTaskName, mapping)
-    targetNode = getMap(targetTaskName, mapping)
-
-    ppath = XY(sourceNode, targetNode, arch)
-
-    p['path'] = ppath
-
-    if DEBUG == True:
-      debug(p['name'] + ": hops=" + str(len(ppath)))
-      for p in ppath:
+  if DEBUG == True:
+    for f in flows:
+      r = routes[f["name"]]
+      debug(f["name"] + ": hops=" + str(len(r["path"])))
+      for p in r["path"]:
         debug("    " + str(p))
 
   info("Enumerating network links...")
 
-  # enumerate network links
-  nlinks = []
-  for e in arch.edges(data=True):
-    nlinks.append(e)
-
-  # add local-to/from links 
-  for n in arch.nodes(data=True):
-    x, y = n
-    nlinks.append((x, 'L', {'label': str(x) + '-L'}))
-    nlinks.append(('L', x, {'label': 'L-' + str(x)}))
+  # enumerate network links (including local-to/from links)
+  nlinks = topology['nlinks']
 
   if DEBUG == True:
     for n in nlinks:
@@ -218,169 +597,87 @@ def pktGen(appfile, mapfile, archfile):
 
   # calculate net_time
   info("Calculating networking time...")
-  
-  for p in packets:
-    sourceTaskName = ""
-    targetTaskName = ""
-
-    for n in app.nodes(data=True):
-      id, data = n
-      if id == p["source"]:
-        sourceTaskName = id
-      if id == p["target"]:
-        targetTaskName = id
-
-    source = getMap(sourceTaskName, mapping)
-    target = getMap(targetTaskName, mapping)
-
-    delta_m = manhattan(source, target, arch)
-    routing_time = (delta_m + 1) * getRoutingTime()
-    payload = getNumFlits(int(p["datasize"]))
-    p['net_time'] = payload + routing_time + 1
+  setNetTimes(flows, routes)
+  markStage(summary, 'routes')
 
-    if DEBUG == True:
-      debug(p['name'] + "=" + str(p['net_time']) +
-        " dm=" + str(delta_m) +
-        " ffrt=" + str(routing_time) +
-        " payload=" + str(payload))
+  # packets share the route and networking time of their flow
+  for p in packets:
+    r = routes[p["flow"]]
+    p['path'] = r['path']
+    p['net_time'] = r['net_time']
 
-  # Generate template matrix, represents the relation P x R, where 
+  # Generate sparse matrices, represent the relation P x R, where 
   # P is the set of all packets and R is the set of all resources. 
-  # Resources are represented by links, thus the len(nlinks).
-  occupancy_line = [-1 for j in range(len(packets))]
-  occupancy = {}
-  min_start = {}
-  deadline  = {}
-
-  for l in nlinks:
-    s, t, o = l
-    occupancy[o['label']] = vcopy(occupancy_line)
-    min_start[o['label']] = vcopy(occupancy_line)
-    deadline[o['label']] = vcopy(occupancy_line)
-  
-  # fill occupancy template
-  for i in range(0, len(packets)):
-    paths = packets[i]['path']
-    for p in paths:
-      l = p['data']['label']
-
-      # update deadline
-      link = deadline[l]
-      link[i] = packets[i]['abs_deadline']
-      deadline[l] = link
-
-      # update min_start
-      link = min_start[l]
-      link[i] = packets[i]['min_start']
-      min_start[l] = link
-
-      # update occupancy
-      link = occupancy[l]
-      link[i] = packets[i]['net_time']
-      occupancy[l] = link
+  # Resources are represented by links, thus the len(nlinks). Only
+  # cells of links traversed by each packet are stored.
+  table = buildLinkTable(packets, nlinks)
 
   # find unused links
-  to_remove = []
-  for f in occupancy:
-    l = occupancy[f]
-    has = False
-    for ll in l:
-      if ll != -1 :
-        has = True
-        break
-    if has != True:
-      to_remove.append(f)
-
-  for i in to_remove:
-    del occupancy[i]
-    del min_start[i]
-    del deadline[i]
+  table, to_remove = pruneUnused(table)
 
   info('Cleaned up ' + str(len(to_remove)) + ' unused network links')
+  record(summary, links=numLinks(table))
+  markStage(summary, 'table')
 
   if DEBUG == True:
-    debug("occupancy")
-    for i in occupancy:
-      debug(i + ' ' + str(occupancy[i]))
-    debug("min_start")
-    for i in min_start:
-      debug(i + ' ' + str(min_start[i]))
-    debug("deadline")
-    for i in deadline:
-      debug(i + ' ' + str(deadline[i]))
+    for field in FIELDS:
+      debug(field)
+      for l, row in iterRows(table, field):
+        debug(l + ' ' + str(row.tolist()))
   
-  # generate header 
-  header = "% "
-  for p in packets:
-    header = header + p["name"] + " "
-
+  # reject instances that cannot have a schedule, without solving
+  if PRECHECK == True:
+    info("Checking necessary conditions (windows, link utilization and demand)...")
+    reasons = checkFeasibility(packets, table, hp)
+    markStage(summary, 'precheck')
+    for kind, where, detail, fnames in reasons[0:VERIFY_REPORT_LIMIT]:
+      error("... " + kind + " of `" + where + "`: " + detail + " (flows " + ", ".join(fnames) + ")")
+    if len(reasons) > 0:
+      record(summary, status='infeasible')
+      info("... problem is unsatisfiable, could not acquire injection time table!")
+      info("All done.")
+      exit()
+    info("... passed")
+
+  # the flow-level model is only solved by minizinc
+  if SOLVER_BACKEND != 'python' or ZINC_STRATEGY == 'flow':
+    info("Checking for Minizinc installation...")
+    if not checkMinizinc():
+      error("Unable to locate Minizinc installation in this system, aborting")
+      exit(1)
 
-  info("Generating optimization problem (Minizinc export)...")
-
-  # generate minizinc tables  
-  info("... problem size: " + str(len(packets)) + "-by-" + str(len(occupancy)))
-  tOccupancy = genTable("occupancy", occupancy)
-  tDeadline = genTable("deadline", deadline)
-  tMinStart = genTable("min_start", min_start)
-
-  if DEBUG == True:
-    debug(str(tOccupancy))
-    debug(str(tDeadline))
-    debug(str(tMinStart))
-
-  lines = []
-  lines.append("hp = " +  str(hp) + ";")
-  lines.append("num_links = " + str(len(occupancy)) + ";")
-  lines.append("num_packets = " + str(len(packets)) + ";")
-  lines.append("")
-  lines.append(tOccupancy)
-  lines.append("")
-  lines.append(tDeadline)
-  lines.append("")
-  lines.append(tMinStart)
-
-  # write minizinc input to disk
   mzFile = '../minizinc/' + appname + '.dzn'
-  info("Writing to `" + mzFile + "`")
-  with open(mzFile, 'w+') as file:
-    for l in lines:
-      file.write(l + '\n')
-
-  info("Checking for Minizinc installation...")
-  try:
-    sp = subprocess.run([ZINC_APP, '--version'], stdout=subprocess.PIPE)
-    version = sp.stdout.decode('utf-8').split("\n")
-    for l in version:
-      if len(l) > 0:
-        info("... " + l)
-  except:
-    error("Unable to locate Minizinc installation in this system, aborting")
-    exit()
-
-  info("Invoking Minizinc with...")
-  cmd = [ZINC_APP, "--solver", ZINC_SOLVER, ZINC_MODEL, mzFile, "-p", str(ZINC_THREADS)]
-  info("... `" + " ".join(cmd) + "`")
-  info("Waiting for " + ZINC_APP + " to finish processing, please wait (it may take a while)")
-  sp = subprocess.run(cmd, stdout=subprocess.PIPE)  
-
-  zincres = sp.stdout.decode('utf-8')
-
-  #TODO: fix print
-  if(DEBUG):
-    debug(zincres)
-
-  # leaves if unsatisfiable
-  if zincres.startswith("====="):
-    info("... `" + zincres.replace('\n','') + "`")
-    info("... problem is unsatisfiable, could not acquire injection time table!")
+  scheduleFile = SCHEDULE_CACHE + appname + '.json'
+
+  previous = None
+  if INCREMENTAL == True:
+    previous = loadSchedule(scheduleFile)
+    if previous == None:
+      warn("No previous schedule at `" + scheduleFile + "`, solving from scratch")
+    else:
+      info("Re-solving from previous schedule `" + scheduleFile + "`")
+
+  if previous != None:
+    releases, status = solveIncremental(flows, routes, packets, table, nlinks, hp, mzFile, previous)
+  else:
+    releases, status = solveAll(flows, routes, packets, table, nlinks, hp, mzFile)
+
+  markStage(summary, 'solve')
+
+  # leaves if unsatisfiable, or if no solver could tell
+  if releases == None:
+    record(summary, status=status)
+    if status == 'unsatisfiable':
+      info("... problem is unsatisfiable, could not acquire injection time table!")
+    else:
+      warn("... no solution found, and no proof that there is none, could not acquire injection time table!")
     info("All done.")
     exit()
   else: 
     info("... solution found!")
 
-  voccupancy = parseoccup(occupancy)
-  releases = parseznc(zincres)
-  
+  voccupancy = maxPerPacket(table, "occupancy").tolist()
+
   info("Collecting schedule from minizinc output...")
   #final packets characterization, scheduled
   schedule = []
@@ -393,11 +690,11 @@ def pktGen(appfile, mapfile, archfile):
       'flow' : p['flow'],
       'source' : {
         'task' : p['source'],
-        'node' : getMap(p['source'], mapping)
+        'node' : routes[p['flow']]['source']
       },
       'target' : {
         'task' : p['target'],
-        'node' : getMap(p['target'], mapping)
+        'node' : routes[p['flow']]['target']
       },
       'min_start' : p['min_start'],
       'abs_deadline' : p['abs_deadline'],
@@ -408,14 +705,57 @@ def pktGen(appfile, mapfile, archfile):
       'path' : p['path']
     })   
 
+  # verify the schedule on its own, whichever backend (or
+  # cached result) it comes from
+  info("Verifying schedule...")
+  report = verifySchedule(schedule, hp)
+  violations = report['violations']
+  for kind, name, detail in violations[0:VERIFY_REPORT_LIMIT]:
+    error("... " + kind + " violation: `" + name + "` " + detail)
+  if len(violations) > VERIFY_REPORT_LIMIT:
+    error("... and " + str(len(violations) - VERIFY_REPORT_LIMIT) + " more violations")
+
+  # the occupancy generator and pktGen use different network times
+  mismatches = report['mismatches']
+  if len(mismatches) > 0:
+    warn("... network time of " + str(len(mismatches)) + " packets differs from occupancy.py (`" +
+      mismatches[0][0] + "`: " + mismatches[0][1] + ")")
+
+  if DEBUG == True:
+    for label in report['links']:
+      l = report['links'][label]
+      debug(label + ": packets=" + str(l['packets']) + " busy=" + str(l['busy']) +
+        " idle=" + str(l['idle']) + " min_gap=" + str(l['min_gap']))
+
+  record(summary, status='solved' if len(violations) == 0 else 'violations')
+  markStage(summary, 'verify')
+
+  if len(violations) == 0:
+    gaps = [(l['min_gap'], label) for label, l in report['links'].items() if l['min_gap'] != None]
+    info("... no violations" + ("" if len(gaps) == 0 else
+      ", tightest link is `" + min(gaps)[1] + "` (min gap of " + str(min(gaps)[0]) + " cycles)"))
+
+    # keep the schedule for incremental re-solving
+    saveSchedule(scheduleFile, schedule, flows, routes, hp)
+
+  # check schedule against the original (non-harmonized) periods
+  if flows != oflows:
+    info("Checking schedule against original periods...")
+    violations = checkOriginalPeriods(schedule, oflows, hp)
+    for v in violations:
+      warn("... instance of `" + v[0] + "` released at " + str(v[1]) + " misses its original deadline")
+    if len(violations) == 0:
+      info("... all original instances are served")
+
   # gen vhdl sim files
-  location = os.path.dirname(os.path.realpath(__file__)) + "/../pkt-sim/packets/"
-  info("Generating pkt-sim input at `" + location + "`")
-  sources = generateVhdlSimInput(arch, schedule, location)
+  info("Generating pkt-sim input at `" + SIM_LOCATION + "`")
+  sources = generateVhdlSimInput(arch, schedule, SIM_LOCATION)
   
   if(DEBUG):
     debug(sources)
 
   # plot
-  info("Plotting using `matplotlib`...")
-  printSched(schedule, hp)
\ No newline at end of file
+  if PLOT == True:
+    info("Plotting using `matplotlib`...")
+    printSched(schedule, hp)
+  markStage(summary, 'export')
\ No newline at end of file
@@ -0,0 +1,48 @@
+import os
+import sys
+from linktable import numLinks
+
+# Python backend (see rt_tools_pybackend). Problems are handed over in
+# memory, built straight from the link table, so that no data file is
+# written and no solver process is started.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if not ROOT in sys.path:
+  sys.path.append(ROOT)
+from rt_tools_pybackend.search3 import searchPackets
+
+# builds the packets of the python backend (see search3.compileProblem)
+# from the packets and the link table (see linktable.py). Packets must
+# also end within the hyperperiod
+def compilePackets(packets, table, hp):
+  compiled = []
+  for p in packets:
+    deadline = min(p['abs_deadline'], hp)
+    compiled.append({
+      'links' : [],
+      'occupancy' : [],
+      'min' : p['min_start'],
+      'latest' : deadline - p['net_time'],
+      'deadline' : deadline
+    })
+
+  rowptr = table['rowptr']
+  for l in range(0, numLinks(table)):
+    a = rowptr[l]
+    b = rowptr[l + 1]
+    for i, o in zip(table['packet'][a:b].tolist(), table['occupancy'][a:b].tolist()):
+      compiled[i]['links'].append(l)
+      compiled[i]['occupancy'].append(o)
+
+  return compiled
+
+# searches release times with the python backend, which gives up after
+# timeout seconds (None for no limit) or once the stop event is set.
+# Returns the release time of each packet (None if no solution was
+# found) and the counters and outcome of the search (see
+# search3.newStats)
+def searchPython(packets, table, hp, workers, ordering, restarts, timeout=None, stop=None):
+  stats = {}
+  release = searchPackets(compilePackets(packets, table, hp), numLinks(table),
+    workers, ordering, restarts, None, stats, stop, timeout)
+  return release, stats
@@ -1,7 +1,10 @@
-import networkx as nx
+import numpy as np
+import hashlib
 import sys
+import os
 import os.path
 from os import path
+from topology import readTopology, LOCAL_PORT
 
 
 # address decode
@@ -26,9 +29,9 @@ def getNumFlits(datasize):
   else:
     return (int)((datasize / BUS_WIDTH) + 1)
 
-def manhattan(source, target, graph):
-  src = getNodeById(source, graph)
-  trg = getNodeById(target, graph)
+def manhattan(source, target, topology):
+  src = getNodeById(source, topology)
+  trg = getNodeById(target, topology)
   x1 = src["data"]["X"]
   x2 = trg["data"]["X"]
   y1 = src["data"]["Y"]
@@ -37,32 +40,17 @@ def manhattan(source, target, graph):
   dy = y2 - y1
   return abs(dx) + abs(dy)
 
-# return an object edge from the graph with given soruce and target nodes
-def getEdge(source, target, graph):
-  for e in graph.edges(data=True):
-    esource, etarget, data = e
-    if source["node"] == esource and target["node"] == etarget:
-      return {"edge": {"source": source, "target": target}, "data": data}
+# return an object edge from the topology with given soruce and target nodes
+def getEdge(source, target, topology):
+  return topology["links"].get((source["node"], target["node"]))
 
-# return an object node from the graph with given X and Y coordinates
-def getNodeByXY(x, y, graph):
-  for n in graph.nodes(data=True):
-    node, data = n
-    if data["X"] == x and data["Y"] == y:
-      return {"node": node, "data": data}
-  return None
+# return an object node from the topology with given X and Y coordinates
+def getNodeByXY(x, y, topology):
+  return topology["coords"].get((x, y))
 
-# return an object node from the graph with given id
-def getNodeById(nodeid, graph):
-  tnode = None
-
-  for n in graph.nodes(data=True):
-    node, data = n
-
-    if node == nodeid:
-      tnode = {"node": node, "data": { 'X' : data["X"], 'Y' : data["Y"]} }
-
-  return tnode
+# return an object node from the topology with given id
+def getNodeById(nodeid, topology):
+  return topology["nodes"].get(nodeid)
 
 # returns a list of paths from source to target node on a given topology
 def parse_XY(source, target, topology):
@@ -71,14 +59,16 @@ def parse_XY(source, target, topology):
     print("unable to read input file")
     exit(0)
 
-  graph = nx.read_gml(topology)
-  XY(source, target, graph)
+  XY(source, target, readTopology(topology))
 
-def XY(source, target, graph):
+# walks the topology from source to target, hop by hop, using the given
+# step function to select the next node. Returns the list of links
+# traversed by the packet, including local source and target links
+def walk(source, target, topology, step):
 
-  # locate source and target nodes within the graph
-  sourceNode = getNodeById(source, graph)
-  targetNode = getNodeById(target, graph)
+  # locate source and target nodes within the topology
+  sourceNode = getNodeById(source, topology)
+  targetNode = getNodeById(target, topology)
 
   # starting search
   currentNode = sourceNode
@@ -87,25 +77,12 @@ def XY(source, target, graph):
   paths = []
   while currentNode != targetNode:
 
-    # X coordinate is aligned
-    if currentNode["data"]["X"] == targetNode["data"]["X"]:
-      if currentNode["data"]["Y"] > targetNode["data"]["Y"]:
-        nextNode = getNodeByXY(currentNode["data"]["X"], currentNode["data"]["Y"] -1, graph)
-      elif currentNode["data"]["Y"] < targetNode["data"]["Y"]:
-        nextNode = getNodeByXY(currentNode["data"]["X"], currentNode["data"]["Y"] +1, graph)
-      else:
-        nextNode = targetNode
-
-    # X coordinate is not aligned yet, move left
-    elif currentNode["data"]["X"] > targetNode["data"]["X"]:
-      nextNode = getNodeByXY(currentNode["data"]["X"] -1, currentNode["data"]["Y"], graph)
-
-    # X coordinate is not aligned yet, move right
-    else:
-      nextNode = getNodeByXY(currentNode["data"]["X"] +1, currentNode["data"]["Y"], graph)
+    nextNode = step(currentNode, targetNode, topology)
     
     # get edge (path), adds path to the output list
-    edge = getEdge(currentNode, nextNode, graph)
+    edge = None
+    if nextNode != None:
+      edge = getEdge(currentNode, nextNode, topology)
 
     if edge == None:
       break #TODO: remove workaround
@@ -116,40 +93,196 @@ def XY(source, target, graph):
     currentNode = nextNode
 
   # fix missing local source and target nodes
-  source = paths[0]['edge']['source']
-  paths.insert(0, {
-    'edge': {
-      'source' : {
-        'node' : 'L',
-        'data' : {
-          'X' : -1,
-          'Y' : -1
-        }
-      },
-      'target' : source
-    },
-    'data' : {
-      'label' : 'L-' + source['node']
-    }
-  })
-
-  target = paths[-1]['edge']['target']
-  paths.append({
-    'edge': {
-      'source' : target,
-      'target' : {
-        'node' : 'L',
-        'data' : {
-          'X' : -1,
-          'Y' : -1
-        }
-      }
-    },
-    'data' : {
-      'label' : target['node'] + '-L'
-    }
-  })
+  paths.insert(0, topology["links"][(LOCAL_PORT, sourceNode["node"])])
+  paths.append(topology["links"][(currentNode["node"], LOCAL_PORT)])
 
   return paths
 
+# moves one hop along the X axis towards the target
+def stepX(currentNode, targetNode, topology):
+  x = currentNode["data"]["X"]
+  y = currentNode["data"]["Y"]
+
+  # move left
+  if x > targetNode["data"]["X"]:
+    return getNodeByXY(x -1, y, topology)
+
+  # move right
+  return getNodeByXY(x +1, y, topology)
+
+# moves one hop along the Y axis towards the target
+def stepY(currentNode, targetNode, topology):
+  x = currentNode["data"]["X"]
+  y = currentNode["data"]["Y"]
+
+  # move down
+  if y > targetNode["data"]["Y"]:
+    return getNodeByXY(x, y -1, topology)
+
+  # move up
+  return getNodeByXY(x, y +1, topology)
+
+# X coordinate first, then Y coordinate
+def stepXY(currentNode, targetNode, topology):
+  if currentNode["data"]["X"] != targetNode["data"]["X"]:
+    return stepX(currentNode, targetNode, topology)
+  return stepY(currentNode, targetNode, topology)
+
+# Y coordinate first, then X coordinate
+def stepYX(currentNode, targetNode, topology):
+  if currentNode["data"]["Y"] != targetNode["data"]["Y"]:
+    return stepY(currentNode, targetNode, topology)
+  return stepX(currentNode, targetNode, topology)
+
+# west-first turn model (deterministic variant): all hops towards west
+# are taken first, then Y coordinate, then hops towards east
+def stepWestFirst(currentNode, targetNode, topology):
+  if currentNode["data"]["X"] > targetNode["data"]["X"]:
+    return stepX(currentNode, targetNode, topology)
+  return stepYX(currentNode, targetNode, topology)
+
+# moves one hop along the given axis ("X" or "Y") of a torus, taking the
+# wraparound link whenever it is shorter than crossing the mesh. Falls
+# back to the mesh direction if the topology has no wraparound link
+def stepTorusAxis(currentNode, targetNode, topology, axis):
+  size = topology["width"] if axis == "X" else topology["height"]
+  c = currentNode["data"][axis]
+  t = targetNode["data"][axis]
+
+  # distance when moving towards increasing coordinates
+  forward = (t - c) % size
+  if forward <= size - forward:
+    n = (c + 1) % size
+  else:
+    n = (c - 1) % size
+
+  if axis == "X":
+    nextNode = getNodeByXY(n, currentNode["data"]["Y"], topology)
+  else:
+    nextNode = getNodeByXY(currentNode["data"]["X"], n, topology)
+
+  if nextNode != None and getEdge(currentNode, nextNode, topology) != None:
+    return nextNode
+
+  if axis == "X":
+    return stepX(currentNode, targetNode, topology)
+  return stepY(currentNode, targetNode, topology)
+
+# XY routing on torus, dimension-ordered with shortest wraparound
+def stepTorusXY(currentNode, targetNode, topology):
+  if currentNode["data"]["X"] != targetNode["data"]["X"]:
+    return stepTorusAxis(currentNode, targetNode, topology, "X")
+  return stepTorusAxis(currentNode, targetNode, topology, "Y")
+
+def XY(source, target, topology):
+  return walk(source, target, topology, stepXY)
 
+def YX(source, target, topology):
+  return walk(source, target, topology, stepYX)
+
+def westFirst(source, target, topology):
+  return walk(source, target, topology, stepWestFirst)
+
+def torusXY(source, target, topology):
+  return walk(source, target, topology, stepTorusXY)
+
+# available routing algorithms, indexed by the `routing_algorithm`
+# attribute of the architecture model
+ROUTING_ALGORITHMS = {
+  "XY" : XY,
+  "YX" : YX,
+  "WF" : westFirst,
+  "TORUS-XY" : torusXY
+}
+
+# returns the routing function declared by the given topology
+def getRoutingAlgorithm(topology):
+  name = topology["routing_algorithm"]
+  if not name in ROUTING_ALGORITHMS:
+    print("unknown routing algorithm `" + str(name) + "`, expected one of " +
+      ", ".join(ROUTING_ALGORITHMS))
+    exit(0)
+  return ROUTING_ALGORITHMS[name]
+
+# number of router-to-router hops of a given path (local links excluded)
+def getHops(paths):
+  return len(paths) - 2
+
+# unique key of a topology, changes whenever nodes, links or the
+# routing algorithm change
+def getTopologyKey(topology):
+  h = hashlib.sha1()
+  h.update(topology["routing_algorithm"].encode('utf-8'))
+  for n in topology["nodes"].values():
+    h.update(repr((n["node"], n["data"]["X"], n["data"]["Y"])).encode('utf-8'))
+  for l in topology["nlinks"]:
+    s, t, d = l
+    h.update(repr((s, t, d["label"])).encode('utf-8'))
+  return h.hexdigest()[:16]
+
+# precomputes the routes between every pair of nodes of the topology
+# as a table of link ids (indexes of topology["nlinks"]). The table has
+# dimensions nodes x nodes x max_path_length, unused cells are -1. If
+# a cache folder is given, the table is stored there as a .npy file and
+# memory-mapped on later calls, instead of being recomputed
+def compileRoutes(topology, cachedir=None):
+
+  cachefile = None
+  if cachedir != None:
+    cachefile = os.path.join(cachedir, "routes-" + 
+      topology["routing_algorithm"] + "-" + getTopologyKey(topology) + ".npy")
+
+  if cachefile != None and path.exists(cachefile):
+    table = np.load(cachefile, mmap_mode='r')
+  else:
+    algorithm = getRoutingAlgorithm(topology)
+    nodes = list(topology["nodes"])
+    ids = {}
+    for i in range(0, len(topology["nlinks"])):
+      s, t, d = topology["nlinks"][i]
+      ids[(s, t)] = i
+
+    routes = []
+    maxlen = 0
+    for s in nodes:
+      for t in nodes:
+        r = [ids[(e["edge"]["source"]["node"], e["edge"]["target"]["node"])]
+          for e in algorithm(s, t, topology)]
+        maxlen = max(maxlen, len(r))
+        routes.append(r)
+
+    dtype = np.int16 if len(ids) < 2**15 else np.int32
+    table = np.full((len(nodes), len(nodes), maxlen), -1, dtype=dtype)
+    for i in range(0, len(routes)):
+      table[i // len(nodes), i % len(nodes), :len(routes[i])] = routes[i]
+
+    # write to a temporary file first, so that concurrent runs never
+    # read a partially written table
+    if cachefile != None:
+      os.makedirs(cachedir, exist_ok=True)
+      tmpfile = cachefile + "." + str(os.getpid()) + ".tmp.npy"
+      np.save(tmpfile, table)
+      os.replace(tmpfile, cachefile)
+
+  topology["routes"] = table
+  topology["nindex"] = {}
+  for n in topology["nodes"]:
+    topology["nindex"][n] = len(topology["nindex"])
+
+  return table
+
+# returns the path from source to target node. Uses the precomputed
+# route table (see compileRoutes) when available, otherwise applies the
+# routing algorithm declared by the topology
+def getRoute(source, target, topology):
+  if not "routes" in topology:
+    return getRoutingAlgorithm(topology)(source, target, topology)
+
+  paths = []
+  nindex = topology["nindex"]
+  for i in topology["routes"][nindex[source], nindex[target]]:
+    if i == -1:
+      break
+    s, t, d = topology["nlinks"][i]
+    paths.append(topology["links"][(s, t)])
+  return paths
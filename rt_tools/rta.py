@@ -0,0 +1,104 @@
+import math
+
+# Worst-case response-time analysis for priority-arbitrated wormhole
+# networks (Shi and Burns). Flows are analysed on their own, from
+# their route and network time, without expanding the hyperperiod. A
+# flow is delayed by higher-priority flows sharing a link with it
+# (direct interference). These may themselves be delayed by flows that
+# do not share links with it (indirect interference), which shows up
+# as interference jitter, the response time of the interfering flow
+# beyond its network time.
+
+# max number of iterations of the response-time recurrence of a flow
+MAX_ITERATIONS = 100000
+
+# assigns priorities by deadline (deadline monotonic), ties are broken
+# by period and then by flow name. Returns flow names, highest first
+def getPriorityOrder(flows):
+  order = sorted(flows, key=lambda f : (f["deadline"], f["period"], f["name"]))
+  return [f["name"] for f in order]
+
+# returns the set of link labels traversed by each route
+def getRouteLinks(routes):
+  links = {}
+  for name in routes:
+    links[name] = set([l['data']['label'] for l in routes[name]['path']])
+  return links
+
+# returns the direct interference set of each flow: the higher-priority
+# flows sharing at least one link with it, in priority order
+def getDirectInterference(order, links):
+  direct = {}
+  for i in range(0, len(order)):
+    fi = order[i]
+    direct[fi] = [fj for fj in order[0:i] if len(links[fi] & links[fj]) > 0]
+  return direct
+
+# returns the indirect interference set of each flow: flows that
+# interfere with its direct interferers, but not with the flow itself
+def getIndirectInterference(order, direct):
+  indirect = {}
+  for fi in order:
+    interfering = set(direct[fi])
+    found = set()
+    for fj in direct[fi]:
+      found |= set([fk for fk in direct[fj] if not fk in interfering])
+    indirect[fi] = [fk for fk in order if fk in found]
+  return indirect
+
+# solves the response-time recurrence of a flow
+#   R = C + sum over j of ceil((R + J_j) / T_j) * C_j
+# for its direct interferers j, each given as (C_j, T_j, J_j). Returns
+# the response time, or None if it exceeds the given bound
+def getResponseTime(c, interferers, bound):
+  r = c
+  for k in range(0, MAX_ITERATIONS):
+    n = c + sum([int(math.ceil((r + jj) / tj)) * cj for cj, tj, jj in interferers])
+    if n > bound:
+      return None
+    if n == r:
+      return r
+    r = n
+  return None
+
+# analyses the given flows (see pktgen.extractFlows), whose routes hold
+# their path and net_time (see pktgen.getFlowRoutes). Flows are
+# analysed in priority order, so that the response time of every
+# interferer is known. Returns a dictionary indexed by flow name of
+#   @priority : 0 for the highest priority
+#   @net_time : network time with no interference (C)
+#   @response : worst-case response time (R), None if it exceeds the
+#               deadline or an interferer has no bound
+#   @direct, @indirect : names of the interfering flows
+def analyzeFlows(flows, routes):
+  byname = dict([(f["name"], f) for f in flows])
+  order = getPriorityOrder(flows)
+  links = getRouteLinks(routes)
+  direct = getDirectInterference(order, links)
+  indirect = getIndirectInterference(order, direct)
+
+  res = {}
+  for k in range(0, len(order)):
+    fi = order[k]
+    c = routes[fi]["net_time"]
+
+    # interferers carry their interference jitter (R_j - C_j, zero
+    # if they are not delayed), which covers indirect interference
+    interferers = []
+    for fj in direct[fi]:
+      rj = res[fj]["response"]
+      if rj == None:
+        interferers = None
+        break
+      cj = routes[fj]["net_time"]
+      interferers.append((cj, byname[fj]["period"], rj - cj))
+
+    res[fi] = {
+      "priority" : k,
+      "net_time" : c,
+      "response" : None if interferers == None else getResponseTime(c, interferers, byname[fi]["deadline"]),
+      "direct" : direct[fi],
+      "indirect" : indirect[fi]
+    }
+
+  return res
@@ -1,6 +1,10 @@
-from pktgen import pktGen
+from pktgen import pktGen, rtaGen
 from terminal import header
-# app entry-point
-def rttool(appfile, mapfile, archfile):
+# app entry-point. Mode is either 'pkt' (time-triggered schedule) or
+# 'rta' (worst-case response-time analysis)
+def rttool(appfile, mapfile, archfile, mode='pkt'):
   header("Welcome to RT_TOOLS r0.0.0.1-alpha")
-  x = pktGen(appfile, mapfile, archfile)
+  if mode == 'rta':
+    x = rtaGen(appfile, mapfile, archfile)
+  else:
+    x = pktGen(appfile, mapfile, archfile)
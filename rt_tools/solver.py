@@ -0,0 +1,299 @@
+import subprocess
+import threading
+import signal
+import queue
+import json
+import time
+import sys
+import os
+from terminal import info, warn
+
+ZINC_APP = 'minizinc'
+UNSATISFIABLE = '=====UNSATISFIABLE====='
+SOLUTION_SEPARATOR = '----------'
+PROCESS_POLL = 0.05   # seconds between checks on running solvers
+TIMEOUT_GRACE = 5     # seconds given to minizinc to stop by itself
+STAT_PREFIX = '%%%mzn-stat'
+STAT_SUMMARY = ['nodes', 'failures', 'flatTime', 'solveTime']
+
+# sets the address space limit (bytes) given as first argument, then
+# replaces itself by the command that follows (see getLimitedCommand)
+LIMIT_SCRIPT = ("import os, sys, resource; l = int(sys.argv[1]); " +
+  "resource.setrlimit(resource.RLIMIT_AS, (l, l)); os.execvp(sys.argv[2], sys.argv[2:])")
+
+# checks whether minizinc is installed, printing its version.
+# Returns False if minizinc could not be found
+def checkMinizinc():
+  try:
+    sp = subprocess.run([ZINC_APP, '--version'], stdout=subprocess.PIPE)
+  except OSError:
+    return False
+
+  version = sp.stdout.decode('utf-8').split("\n")
+  for l in version:
+    if len(l) > 0:
+      info("... " + l)
+  return True
+
+# returns the command line for solving the given model and data file.
+# Threads are omitted (None) for solvers that do not support them.
+# Statistics are always requested, the time limit (seconds) is
+# passed to minizinc unless it is None
+def getMinizincCommand(model, dznfile, solver, threads, timeout=None):
+  cmd = [ZINC_APP, "--solver", solver, model, dznfile, "--statistics"]
+  if threads != None:
+    cmd = cmd + ["-p", str(threads)]
+  if timeout != None:
+    cmd = cmd + ["--time-limit", str(int(timeout * 1000))]
+  return cmd
+
+# reads the lines of a stream into a queue, None marks the end
+def readLines(stream, lines):
+  for line in iter(stream.readline, b''):
+    lines.put(line.decode('utf-8'))
+  lines.put(None)
+
+# wraps a command so that its address space is limited to the given
+# size (megabytes). A python process sets the limit and then replaces
+# itself by minizinc, which passes the limit on to the actual solver.
+# Unlike preexec_fn, this is safe when solvers are started from
+# several threads at once (see runPortfolio)
+def getLimitedCommand(cmd, memory):
+  return [sys.executable, "-c", LIMIT_SCRIPT, str(int(memory) * 1024 * 1024)] + cmd
+
+# parses one statistics line (%%%mzn-stat: name=value) into the given
+# dictionary. Numbers are converted, other values are kept as text
+def parseStatistic(line, stats):
+  name, sep, value = line[len(STAT_PREFIX):].lstrip(':').strip().partition('=')
+  if sep == '':
+    return
+  for conv in [int, float]:
+    try:
+      stats[name] = conv(value)
+      return
+    except ValueError:
+      pass
+  stats[name] = value.strip('"')
+
+# returns the status of a finished solver from its output lines
+def getStatus(lines, returncode):
+  statuses = [l.strip() for l in lines if l.startswith("=====")]
+  if SOLUTION_SEPARATOR in [l.strip() for l in lines]:
+    return 'SATISFIED'
+  if UNSATISFIABLE in statuses:
+    return 'UNSATISFIABLE'
+  if returncode != 0 or "=====ERROR=====" in statuses:
+    return 'ERROR'
+  return 'UNKNOWN'
+
+# runs a solver command, reading its output as it is produced.
+#   @timeout : wall-clock limit in seconds (None for no limit). The
+#              solver is killed TIMEOUT_GRACE seconds after the limit,
+#              as minizinc is given the limit too and stops by itself
+#   @memory : memory limit in megabytes (None for no limit)
+#   @cancel : event (see threading.Event), the solver is killed once set
+#   @onSolution : called with the elapsed time of each solution found
+# Returns a dictionary containing the `output` (statistics excluded),
+# the `status` (SATISFIED, UNSATISFIABLE, UNKNOWN, ERROR, TIMEOUT or
+# CANCELLED), the parsed `statistics`, the number of `solutions` and
+# the elapsed `time` in seconds
+def runProcess(cmd, timeout=None, memory=None, cancel=None, onSolution=None):
+  start = time.time()
+  if memory != None:
+    cmd = getLimitedCommand(cmd, memory)
+  process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    start_new_session=True)
+
+  # a reader thread keeps the pipe from filling up, while
+  # this thread checks limits between lines
+  lines = queue.Queue()
+  reader = threading.Thread(target=readLines, args=(process.stdout, lines), daemon=True)
+  reader.start()
+
+  output = []
+  stats = {}
+  solutions = 0
+  status = None
+  try:
+    while True:
+      if cancel != None and cancel.is_set():
+        status = 'CANCELLED'
+        break
+      if timeout != None and time.time() - start > timeout + TIMEOUT_GRACE:
+        status = 'TIMEOUT'
+        break
+
+      try:
+        line = lines.get(timeout=PROCESS_POLL)
+      except queue.Empty:
+        continue
+
+      if line == None:
+        break
+      if line.startswith(STAT_PREFIX):
+        parseStatistic(line, stats)
+        continue
+
+      output.append(line)
+      if line.strip() == SOLUTION_SEPARATOR:
+        solutions = solutions + 1
+        if onSolution != None:
+          onSolution(time.time() - start)
+  finally:
+    if status == None:
+      process.wait()
+    else:
+      kill(process)
+    process.stdout.close()
+
+  if status == None:
+    status = getStatus(output, process.returncode)
+    # minizinc reports its own time limit as an unknown result
+    if status == 'UNKNOWN' and timeout != None and time.time() - start >= timeout:
+      status = 'TIMEOUT'
+  elif solutions > 0:
+    status = 'SATISFIED'
+
+  # interrupted solvers give no answer
+  if solutions == 0 and not "=====" in "".join(output):
+    output.append("=====UNKNOWN=====\n")
+
+  return {
+    'output' : "".join(output),
+    'status' : status,
+    'statistics' : stats,
+    'solutions' : solutions,
+    'time' : time.time() - start
+  }
+
+# one-line summary of the main statistics of a solver run
+def getStatisticsSummary(result):
+  stats = result['statistics']
+  items = ["time=" + ("%.2f" % result['time']) + "s"]
+  for name in STAT_SUMMARY:
+    if name in stats:
+      items.append(name + "=" + str(stats[name]))
+  return ", ".join(items)
+
+# runs minizinc for the given model and data file, blocks until
+# minizinc finishes (or hits the given limits, or is cancelled, see
+# runProcess) and returns the result. Solutions are reported as they
+# are found
+def runMinizinc(model, dznfile, solver, threads, verbose=True, timeout=None, memory=None, cancel=None):
+  cmd = getMinizincCommand(model, dznfile, solver, threads, timeout)
+  onSolution = None
+  if verbose:
+    info("... `" + " ".join(cmd) + "`")
+    info("Waiting for " + ZINC_APP + " to finish processing, please wait (it may take a while)")
+    onSolution = lambda t : info("... solution received after " + ("%.2f" % t) + "s")
+
+  result = runProcess(cmd, timeout, memory, cancel, onSolution)
+  if verbose:
+    info("... " + solver + " " + result['status'].lower() + " (" + getStatisticsSummary(result) + ")")
+    if result['status'] == 'TIMEOUT':
+      warn("... " + solver + " hit the time limit of " + str(timeout) + "s")
+  return result
+
+# whether the solver proved that there is no solution. Unknown
+# results, errors and time limits prove nothing
+def isUnsatisfiable(result):
+  return result['status'] == 'UNSATISFIABLE'
+
+# lists the solvers installed in the system, as reported by minizinc
+def getInstalledSolvers():
+  try:
+    sp = subprocess.run([ZINC_APP, '--solvers-json'], stdout=subprocess.PIPE)
+    return json.loads(sp.stdout.decode('utf-8'))
+  except (OSError, ValueError):
+    return []
+
+# locates a solver by id, name or tag (case insensitive), returns
+# its configuration or None if not installed
+def findSolver(name, installed):
+  name = name.lower()
+  for s in installed:
+    sid = s.get('id', '').lower()
+    keys = [sid, s.get('name', '').lower()] + [t.lower() for t in s.get('tags', [])]
+    if name in keys or sid.endswith('.' + name):
+      return s
+  return None
+
+# builds a portfolio out of the given solver names, keeping only the
+# installed ones. Cores are split among solvers: single-threaded ones
+# take one core, the others share the remaining cores evenly. Returns
+# a list of (solver, threads), threads is None for single-threaded ones
+def getPortfolio(names, cores):
+  installed = getInstalledSolvers()
+  solvers = []
+  for n in names:
+    s = findSolver(n, installed)
+    if s == None:
+      info("... solver `" + n + "` is not installed, skipping")
+    else:
+      solvers.append((n, '-p' in s.get('stdFlags', [])))
+
+  nparallel = len([s for s in solvers if s[1]])
+  spare = cores - (len(solvers) - nparallel)
+  threads = max(1, spare // max(1, nparallel))
+
+  return [(n, threads if parallel else None) for n, parallel in solvers]
+
+# whether the given result is a final answer: a solution, or a proof
+# that there is none (unknown results and errors are not final)
+def isFinal(result):
+  return result['status'] in ['SATISFIED', 'UNSATISFIABLE']
+
+# kills a solver along with its child processes (minizinc
+# runs solvers as subprocesses)
+def kill(process):
+  try:
+    os.killpg(process.pid, signal.SIGKILL)
+  except OSError:
+    pass
+  process.wait()
+
+# runs one solver of a portfolio (thread). The first solver to give a
+# final answer is recorded in `race` and cancels the others
+def raceSolver(solver, cmd, timeout, memory, race):
+  result = runProcess(cmd, timeout, memory, race['cancel'])
+  with race['lock']:
+    if race['solver'] == None and isFinal(result):
+      race['solver'] = solver
+      race['result'] = result
+      race['cancel'].set()
+    elif result['status'] != 'CANCELLED':
+      info("... `" + solver + "` finished with no answer (" + result['status'].lower() + ")")
+
+# runs all solvers of the portfolio at once on the same model and data
+# file, each one within the given limits (see runProcess). The first
+# final answer is kept and the other solvers are killed. Returns
+# (solver, result), solver is None if no solver could give a final answer
+def runPortfolio(model, dznfile, portfolio, timeout=None, memory=None):
+  race = {
+    'lock' : threading.Lock(),
+    'cancel' : threading.Event(),
+    'solver' : None,
+    'result' : None
+  }
+
+  racers = []
+  for solver, threads in portfolio:
+    cmd = getMinizincCommand(model, dznfile, solver, threads, timeout)
+    info("... `" + " ".join(cmd) + "`")
+    racers.append(threading.Thread(target=raceSolver, args=(solver, cmd, timeout, memory, race)))
+
+  info("Waiting for the first of " + str(len(racers)) + " solvers to finish, please wait (it may take a while)")
+  try:
+    for r in racers:
+      r.start()
+    for r in racers:
+      r.join()
+  finally:
+    race['cancel'].set()
+
+  if race['solver'] == None:
+    return (None, {'output' : "=====UNKNOWN=====\n", 'status' : 'UNKNOWN',
+      'statistics' : {}, 'solutions' : 0, 'time' : 0})
+
+  info("... " + race['solver'] + " (" + getStatisticsSummary(race['result']) + ")")
+  return (race['solver'], race['result'])
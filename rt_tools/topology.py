@@ -0,0 +1,79 @@
+import networkx as nx
+from os import path
+
+# label of the local port (processing element) of any router
+LOCAL_PORT = 'L'
+
+# creates an object node for the local port, routing
+# functions take it as source and target of local links
+def localNode():
+  return {'node' : LOCAL_PORT, 'data' : {'X' : -1, 'Y' : -1}}
+
+# compiles a topology (architecture graph) into lookup tables, so that
+# nodes and links can be located without walking the whole graph.
+# inputs
+#   @graph : the architecture graph (as read from the gml file)
+# outputs
+#   @topology : a dictionary containing
+#     - graph  : the original graph
+#     - routing_algorithm : as declared in the graph, defaults to XY
+#     - width, height : dimensions of the network, in nodes
+#     - nodes  : node id -> object node
+#     - coords : (X, Y) -> object node
+#     - links  : (source id, target id) -> object edge, including local links
+#     - nlinks : list of (source, target, data) for every link of the network,
+#                router-to-router links first, then local links, node by node
+def compileTopology(graph):
+  nodes = {}
+  coords = {}
+  links = {}
+  nlinks = []
+
+  for n in graph.nodes(data=True):
+    node, data = n
+    nobj = {'node' : node, 'data' : {'X' : data['X'], 'Y' : data['Y']}}
+    nodes[node] = nobj
+    coords[(data['X'], data['Y'])] = nobj
+
+  # router-to-router links
+  for e in graph.edges(data=True):
+    source, target, data = e
+    links[(source, target)] = {
+      'edge' : {'source' : nodes[source], 'target' : nodes[target]},
+      'data' : data
+    }
+    nlinks.append(e)
+
+  # router-to-pe and pe-to-router links
+  for node in nodes:
+    outdata = {'label' : str(node) + '-' + LOCAL_PORT}
+    indata = {'label' : LOCAL_PORT + '-' + str(node)}
+    links[(node, LOCAL_PORT)] = {
+      'edge' : {'source' : nodes[node], 'target' : localNode()},
+      'data' : outdata
+    }
+    links[(LOCAL_PORT, node)] = {
+      'edge' : {'source' : localNode(), 'target' : nodes[node]},
+      'data' : indata
+    }
+    nlinks.append((node, LOCAL_PORT, outdata))
+    nlinks.append((LOCAL_PORT, node, indata))
+
+  return {
+    'graph' : graph,
+    'routing_algorithm' : graph.graph.get('routing_algorithm', 'XY'),
+    'width' : max([c[0] for c in coords]) + 1,
+    'height' : max([c[1] for c in coords]) + 1,
+    'nodes' : nodes,
+    'coords' : coords,
+    'links' : links,
+    'nlinks' : nlinks
+  }
+
+# reads and compiles a topology from the given architecture file
+def readTopology(archfile):
+  if not path.exists(archfile):
+    print("unable to read architecture file")
+    exit(0)
+
+  return compileTopology(nx.read_gml(archfile))
@@ -0,0 +1,103 @@
+import numpy as np
+from routing import getNumFlits, getRoutingTime, getHops
+
+# Schedule verifier. Checks a schedule (see pktgen.py) on its own,
+# without the link table or the minizinc model it was solved from:
+# intervals [release, release + net_time] are rebuilt from the path of
+# each packet, sorted per link and swept once, so that a mismatch
+# between the generator and the model shows up before simulation.
+
+# network time of a scheduled packet under the cost model of the
+# occupancy generator (see occupancy.py), which counts one flit less
+# and leaves out the first router and the +1 that pktGen counts
+def getOccupancyNetTime(s):
+  return (getNumFlits(s['datasize_bytes']) - 1) + getHops(s['path']) * getRoutingTime()
+
+# checks the given schedule, returns a dictionary containing
+#   @violations : list of (kind, packet name, detail), kind is one of
+#                 'min_start', 'deadline', 'hyperperiod' or 'overlap'
+#                 (detail is the other packet and link)
+#   @mismatches : list of (packet name, detail) of the packets whose
+#                 network time differs from the occupancy generator
+#                 (see getOccupancyNetTime). Schedules are built with
+#                 pktGen's network times, so these are not violations
+#   @links : dictionary indexed by link label of the number of
+#            `packets`, the `busy` and `idle` cycles within the
+#            hyperperiod, and the `min_gap` between consecutive packets
+#            (None for links with a single packet)
+def verifySchedule(schedule, hp):
+  violations = []
+  n = len(schedule)
+
+  release = np.array([s['release'] for s in schedule], dtype=np.int64)
+  net_time = np.array([s['net_time'] for s in schedule], dtype=np.int64)
+  min_start = np.array([s['min_start'] for s in schedule], dtype=np.int64)
+  deadline = np.array([s['abs_deadline'] for s in schedule], dtype=np.int64)
+  expected = np.array([getOccupancyNetTime(s) for s in schedule], dtype=np.int64)
+  end = release + net_time
+
+  checks = [
+    ('min_start', release < min_start, lambda i : "released at " + str(release[i]) + " < " + str(min_start[i])),
+    ('deadline', end > deadline, lambda i : "ends at " + str(end[i]) + " > " + str(deadline[i])),
+    ('hyperperiod', end > hp, lambda i : "ends at " + str(end[i]) + " > " + str(hp))
+  ]
+  for kind, mask, detail in checks:
+    for i in np.flatnonzero(mask).tolist():
+      violations.append((kind, schedule[i]['name'], detail(i)))
+
+  # one interval per packet and link
+  labels = []
+  index = {}
+  link = []
+  packet = []
+  for i in range(0, n):
+    for l in schedule[i]['path']:
+      label = l['data']['label']
+      if not label in index:
+        index[label] = len(labels)
+        labels.append(label)
+      link.append(index[label])
+      packet.append(i)
+
+  link = np.array(link, dtype=np.int64)
+  packet = np.array(packet, dtype=np.int64)
+  starts = release[packet]
+  ends = end[packet]
+  order = np.lexsort((starts, link))
+  link, packet, starts, ends = link[order], packet[order], starts[order], ends[order]
+
+  # links are shifted apart, so that a single running maximum of ends
+  # covers all links. A packet overlaps (packets must be one cycle
+  # apart) if it starts before the latest end of its link so far
+  shift = int(max(hp, int(ends.max()) if len(ends) > 0 else 0)) + 1
+  latest = np.maximum.accumulate(ends + link * shift)
+  overlap = np.zeros(len(starts), dtype=bool)
+  overlap[1:] = (link[1:] == link[:-1]) & (starts[1:] + link[1:] * shift <= latest[:-1])
+  overlap = np.flatnonzero(overlap)
+
+  for k in overlap.tolist():
+    # the packet holding the latest end so far
+    a = np.searchsorted(link, link[k])
+    other = packet[a + int(np.argmax(ends[a:k]))]
+    violations.append(('overlap', schedule[packet[k]]['name'],
+      "with " + schedule[other]['name'] + " on " + labels[link[k]]))
+
+  # per-link statistics
+  bounds = np.searchsorted(link, np.arange(len(labels) + 1))
+  gaps = starts[1:] - ends[:-1] - 1
+  links = {}
+  for l in range(0, len(labels)):
+    a = bounds[l]
+    b = bounds[l + 1]
+    busy = int((ends[a:b] - starts[a:b]).sum())
+    links[labels[l]] = {
+      'packets' : int(b - a),
+      'busy' : busy,
+      'idle' : hp - busy,
+      'min_gap' : int(gaps[a:b - 1].min()) if b - a > 1 else None
+    }
+
+  mismatches = [(schedule[i]['name'], "occupancy.py gives " + str(expected[i]) + ", schedule uses " +
+    str(net_time[i])) for i in np.flatnonzero(net_time != expected).tolist()]
+
+  return {'violations' : violations, 'mismatches' : mismatches, 'links' : links}
@@ -0,0 +1,3 @@
+# Python backend of rt_tools. Its modules import each other by plain
+# name when the backend runs on its own (see __main__.py), and relative
+# to the package when rt_tools imports it (see rt_tools/pysolver.py).
@@ -1,23 +1,44 @@
-from terminal import info
-from search3 import search3
+import sys
+from terminal import info, error
+from search3 import compileProblem, searchPackets
+from loaddzn import loadDzn
 from os import path
 #from problem_syntheticA import occupancy, min_start, deadline
 from problem_dctVerify import occupancy, min_start, deadline
+
+WORKERS = 1         # search processes, 1 for sequential search, None for one per core
+ORDERING = 'edf'    # variable ordering: 'slack', 'edf', 'link' or 'wdeg'
+RESTARTS = True     # luby restarts with nogoods (sequential search only)
+TIMEOUT = None      # seconds before the search gives up (None for no limit)
+
 def main():
-  
-  num_links = len(min_start)
-  num_packets = len(min_start[0])
+  problem = (min_start, occupancy, deadline, None)
+
+  # problems exported by rt_tools can be given as a .dzn file
+  if len(sys.argv) > 1:
+    if not path.exists(sys.argv[1]):
+      error("Could not read problem file `" + sys.argv[1] + "`")
+      exit(1)
+    info("Reading `" + sys.argv[1] + "`")
+    problem = loadDzn(sys.argv[1])
+
+  stats = {}
+  packets = compileProblem(*problem)
+  release = searchPackets(packets, len(problem[1]), WORKERS, ORDERING, RESTARTS,
+    stats=stats, timeout=TIMEOUT)
 
-  res, entered, ignored = search3(min_start, occupancy, deadline)
-  
-  if res == None:
-    print("No solution found.")
+  if stats['status'] == 'unsatisfiable':
+    print("No solution exists.")
+  elif release == None:
+    print("No solution found, the search gave up.")
   else:
+    # one release time per packet, also for packets that take no link
     info("SOLUTION:")
-    for i in res:
-      print(i)
-    info("Ignored nodes: " + str(ignored))
-    info("Entered nodes: " + str(entered))
+    for j in range(0, len(release)):
+      print(str(j) + ": " + str(release[j]))
+  info("Ignored nodes: " + str(stats['ignored']))
+  info("Entered nodes: " + str(stats['entered']))
+  info("Failures: " + str(stats['failures']) + ", restarts: " + str(stats['restarts']))
 
 # Automatically jumps to main if called from command line
 if __name__ == "__main__":
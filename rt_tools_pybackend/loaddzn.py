@@ -0,0 +1,101 @@
+import re
+try:
+  from .terminal import error
+except ImportError:
+  from terminal import error
+
+# names of the hyperperiod in data files, older exports use the second
+HP_NAMES = ['hp', 'hyperperiod_length']
+
+'''
+Parses a single minizinc value: an integer, an one-dimensional array,
+an array of sets, or a two-dimensional array ([| ... | ... |]).
+@param expr the value, as text
+@returns an integer, or a (nested) list of integers
+'''
+def parseValue(expr):
+  expr = expr.strip()
+  if expr.startswith('[|'):
+    rows = expr[2:-2].split('|')
+    return [[int(v) for v in r.split(',') if v.strip() != ''] for r in rows if r.strip() != '']
+  if expr.startswith('['):
+    inner = expr[1:-1]
+    if '{' in inner:
+      return [[int(v) for v in s.split(',') if v.strip() != ''] for s in re.findall(r'\{([^}]*)\}', inner)]
+    return [int(v) for v in inner.split(',') if v.strip() != '']
+  return int(expr)
+
+'''
+Reads the assignments of a .dzn file into a dictionary.
+@param filename the .dzn file
+@returns a dictionary of values, indexed by name
+'''
+def readDzn(filename):
+  with open(filename) as file:
+    text = file.read()
+
+  # comments run up to the end of the line
+  text = re.sub(r'%[^\n]*', '', text)
+
+  data = {}
+  for stmt in text.split(';'):
+    if '=' in stmt:
+      name, expr = stmt.split('=', 1)
+      data[name.strip()] = parseValue(expr)
+  return data
+
+'''
+Returns the hyperperiod of a problem, under any of HP_NAMES.
+@param data the values of the .dzn file (see readDzn)
+@param filename the .dzn file, for error messages
+@returns the hyperperiod
+'''
+def getHyperperiod(data, filename):
+  for name in HP_NAMES:
+    if name in data:
+      return data[name]
+  error("No hyperperiod (" + " or ".join(HP_NAMES) + ") in `" + filename + "`")
+  exit(1)
+
+'''
+Replaces the sparse cells (-1) of a matrix by None.
+'''
+def sparse(m):
+  return [[None if v == -1 else v for v in row] for row in m]
+
+'''
+Loads a problem exported by rt_tools (see rt_tools/dzn.py), either in
+the matrix format (link-by-packet tables) or in the compact format
+(one value per packet and sets of packets sharing links). Packets must
+also end within the hyperperiod, which is folded into the deadlines.
+@param filename the .dzn file
+@returns the min_start, occupancy and deadline matrices, as expected
+  by search3 (None for links not used by a packet), and the window of
+  each packet as (min_start, occupancy, deadline). Packets sharing no
+  link appear in no set of the compact format, only there. Windows
+  are None for the matrix format
+'''
+def loadDzn(filename):
+  data = readDzn(filename)
+  hp = getHyperperiod(data, filename)
+
+  if 'link_packets' in data:
+    sets = data['link_packets']
+    num_packets = data['num_packets']
+    min_start = [[None for j in range(0, num_packets)] for s in sets]
+    occupancy = [[None for j in range(0, num_packets)] for s in sets]
+    deadline = [[None for j in range(0, num_packets)] for s in sets]
+    for i in range(0, len(sets)):
+      # packets are 1-indexed in minizinc
+      for j in [p - 1 for p in sets[i]]:
+        min_start[i][j] = data['min_start'][j]
+        occupancy[i][j] = data['occupancy'][j]
+        deadline[i][j] = min(data['deadline'][j], hp)
+    windows = [(data['min_start'][j], data['occupancy'][j], min(data['deadline'][j], hp))
+      for j in range(0, num_packets)]
+    return (min_start, occupancy, deadline, windows)
+
+  min_start = sparse(data['min_start'])
+  occupancy = sparse(data['occupancy'])
+  deadline = [[None if v == None else min(v, hp) for v in row] for row in sparse(data['deadline'])]
+  return (min_start, occupancy, deadline, None)
@@ -1,44 +1,32 @@
-from numpy import empty
-from terminal import debug, error, info
+from bisect import bisect_left, bisect_right
+from heapq import heapify, heappush, heappop
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import Event
+try:
+  from .terminal import error
+except ImportError:
+  from terminal import error
+import random
+import time
 import os
 
+SPLIT_FACTOR = 8      # subproblems per worker in parallel search
+STOP_CHECK = 1024     # nodes between checks for a stop request
+STOP_POLL = 0.1       # seconds between checks for a stop request in parallel search
+CHRONO_NODES = 200000 # nodes of chronological search before giving up (None for no limit)
+ORDERINGS = ['slack', 'edf', 'link', 'wdeg']
+RESTART_BASE = 100    # failures allowed in the first run, scaled by the luby sequence
+MAX_RESTARTS = 64     # runs of restarted search before giving up
+MAX_NOGOOD_SIZE = 16  # larger nogoods are rarely triggered, and are not recorded
+MAX_NOGOODS = 100000  # nogoods kept across restarts
 
-'''
-Prints a matrix, row by row.
-'''
-def mprint(m):
-  for i in m:
-    print(i)
-
-'''
-Copies given vector and returns a new 
-vector containing the same elements as 
-the entered vector.
-@param m the input vector
-@returns a vector containing the same elements of m
-'''
-def vcopy(m):
-  v = []
-  for i in m:
-    v.append(i) 
-  return v   
+# set in worker processes, signals that a solution was found elsewhere
+stop_event = None
 
-'''
-Copies a bi-dimensional matrix and returns a 
-new matrix containing the same elements as the 
-entered matrix.
-@param m the input matrix
-@returns a matrix containing the same elements of m
-'''
-def mcopy(m):
-  v = []
-  for i in m:
-    v.append(vcopy(i))
-  return v
 
 '''
 Checks whether two ranges overleap.
-@param ra range a, the first range 
+@param ra range a, the first range
 @param rb range b, the second range
 @returns True if the ranger overleap, otherwise False
 '''
@@ -49,183 +37,845 @@ def overleap(ra, rb):
   return not(maxa < minb or maxb < mina)
 
 '''
-Checks whether a given partial solution has a valid
-solution within it. 
-@param V the partial solution
-@returns True if a solution is still feasible, False otherwise
-'''
-def check(V):
-  for i in range(0, len(V)):
-    for j in range(0, len(V[0]) - 1):
-      if(V[i][j] != -1):
-        rangea = V[i][j]
-        for k in range(j + 1, len(V[0])):
-          if(V[i][k] != -1):
-            rangeb = V[i][k]
-            if overleap(rangea, rangeb):
-              return False
+Compiles the link-by-packet matrices into one entry per packet,
+holding the links it uses, its occupancy of each link, its deadline,
+and the earliest and latest release times it can take.
+@param min_start minimum release time values
+@param occupancy occupancy values
+@param deadline deadline values
+@param windows (min_start, occupancy, deadline) of each packet, used
+  for packets that take no link of the matrices (None if not known)
+@returns a list of packets
+'''
+def compileProblem(min_start, occupancy, deadline, windows=None):
+  packets = []
+  for j in range(0, len(occupancy[0])):
+    p = {'links' : [], 'occupancy' : [], 'min' : 0, 'latest' : None, 'deadline' : None}
+    for i in range(0, len(occupancy)):
+      if occupancy[i][j] != None:
+        p['links'].append(i)
+        p['occupancy'].append(occupancy[i][j])
+        p['min'] = max(p['min'], min_start[i][j])
+        latest = deadline[i][j] - occupancy[i][j]
+        if p['latest'] == None or latest < p['latest']:
+          p['latest'] = latest
+        if p['deadline'] == None or deadline[i][j] < p['deadline']:
+          p['deadline'] = deadline[i][j]
+    if p['latest'] == None and windows != None:
+      p['min'], o, p['deadline'] = windows[j]
+      p['latest'] = p['deadline'] - o
+    elif p['latest'] == None:
+      p['latest'] = p['min']
+      p['deadline'] = p['min']
+    packets.append(p)
+  return packets
+
+'''
+Creates an empty interval set per link. Each set holds the
+intervals [start, end] of the packets placed on the link, as sorted
+lists of starts, ends and packets. Intervals never overleap, thus
+sorting them by start also sorts them by end.
+@param num_links the number of links
+@returns a list of interval sets
+'''
+def newIntervals(num_links):
+  return [{'starts' : [], 'ends' : [], 'packets' : []} for i in range(0, num_links)]
+
+'''
+Checks whether [start, end] overleaps any interval of the set.
+Only the last interval starting up to `end` can overleap it.
+@param iv the interval set
+@returns True if the interval fits, False otherwise
+'''
+def fits(iv, start, end):
+  k = bisect_right(iv['starts'], end) - 1
+  return k < 0 or iv['ends'][k] < start
+
+'''
+Inserts the interval [start, end] of packet j into the set, in place.
+'''
+def insert(iv, start, end, j):
+  k = bisect_left(iv['starts'], start)
+  iv['starts'].insert(k, start)
+  iv['ends'].insert(k, end)
+  iv['packets'].insert(k, j)
+
+'''
+Removes the interval starting at `start` from the set (undo of insert).
+'''
+def remove(iv, start):
+  k = bisect_left(iv['starts'], start)
+  del iv['starts'][k]
+  del iv['ends'][k]
+  del iv['packets'][k]
+
+'''
+Returns the packets whose intervals overleap [start, end].
+'''
+def overlapping(iv, start, end):
+  a = bisect_left(iv['ends'], start)
+  b = bisect_right(iv['starts'], end)
+  return iv['packets'][a:b]
+
+'''
+Checks whether a packet can be released at time t.
+@param intervals interval sets of all links
+@param p the packet
+@returns True if no link of the packet is taken, False otherwise
+'''
+def canPlace(intervals, p, t):
+  for l, o in zip(p['links'], p['occupancy']):
+    if not fits(intervals[l], t, t + o):
+      return False
   return True
 
 '''
-Calculates a vector of slack times for a given 
-problem. 
-@param V the base problem
-@returns a vector of slack times
-'''
-def lstf(V):
-  slack_time = [None for i in V[0]]
-  for i in range(0, len(V)):
-    for j in range(0, len(V[i])):
-      if V[i][j] != None:
-        li, ls = V[i][j]
-        st = ls - li
-        if(slack_time[j] == None or st < slack_time[j]):
-            slack_time[j] = st
-  return slack_time
-
-'''
-Finds the next node to be processed given a list 
-of available nodes and a max heuristic
-@param avp the list of available nodes 
-@param h the heuristic values 
-@returns The index of the next node to be processed,
-  -1 otherwise. 
-'''
-def nextnode(avp, h):
-  idx = None
-  max = None
-  for i in range(0, len(avp)):
-    if (avp[i] and (idx == None or h[i] < max)):
-      max = h[i]
-      idx = i
-  return idx
-
-'''
-Checks whether some packets conflits with
-other packets in the model. 
-'''
-def check_consistency(V, O, idx):
-
-  # acquire range for package at V[idx]
-  rangea = (0,0)
-  for i in range(0, len(V)-1):
-    if(V[i][idx] != None):
-      rangea = (V[i][idx], V[i][idx] + O[i][idx])
-
-  # for each link in the model
-  for i in range(0, len(V)-1):
-
-    # ignore row if current packet doesnt use that link
-    if(V[i][idx] != None):
-
-      # for each packet in that link, find if it 
-      # overleaps current packet
-      for j in range(0, len(V[0])-1):
-        if(j != idx and V[i][j] != None): # avoid comparing to itself
-          rangeb = (V[i][j], V[i][j] + O[i][j])
-
-          if(overleap(rangea, rangeb)):
-            return False
+Places packet j at time t on all of its links.
+'''
+def place(intervals, packets, j, t):
+  p = packets[j]
+  for l, o in zip(p['links'], p['occupancy']):
+    insert(intervals[l], t, t + o, j)
+
+'''
+Removes a packet placed at time t from all of its links.
+'''
+def unplace(intervals, p, t):
+  for l in p['links']:
+    remove(intervals[l], t)
+
+'''
+Event-point candidates for the release time of a packet: its minimum
+release time, and the cycle right after the end of each interval
+already placed on its links, within the release window. Any release
+time between two event points can be shifted back to the former, as
+far as placed packets are concerned (packets placed later are not).
+@param intervals interval sets of all links
+@param p the packet
+@returns a sorted list of release times
+'''
+def candidates(intervals, p):
+  if p['latest'] < p['min']:
+    return []
+  points = set([p['min']])
+  for l in p['links']:
+    ends = intervals[l]['ends']
+    a = bisect_left(ends, p['min'])
+    b = bisect_right(ends, p['latest'] - 1)
+    for e in ends[a:b]:
+      points.add(e + 1)
+  return sorted(points)
+
+'''
+Luby sequence (1, 1, 2, 1, 1, 2, 4, 1, ...), scales the number of
+failures allowed in the i-th run of restarted search (from 1).
+'''
+def luby(i):
+  k = 1
+  while (1 << k) - 1 < i:
+    k = k + 1
+  if (1 << k) - 1 == i:
+    return 1 << (k - 1)
+  return luby(i - (1 << (k - 1)) + 1)
+
+'''
+Slack time of each packet, the length of its release window.
+'''
+def slack(packets):
+  return [p['latest'] - p['min'] for p in packets]
+
+'''
+Static variable orderings, packets with lower keys are placed first:
+  slack, the lesser slack time first
+  edf, the earliest deadline first
+  link, packets of the most loaded link first (most-constrained link),
+    then the lesser slack time
+  wdeg, the packets with the most links first. The actual ordering is
+    dynamic, see selectNext
+@param packets compiled packets (see compileProblem)
+@param ordering one of ORDERINGS
+@returns a list of keys, one per packet
+'''
+def getKeys(packets, num_links, ordering):
+  h = slack(packets)
+  if ordering == 'edf':
+    return [p['deadline'] for p in packets]
+
+  if ordering == 'link':
+    load = [0 for l in range(0, num_links)]
+    for p in packets:
+      for l, o in zip(p['links'], p['occupancy']):
+        load[l] += o
+    return [(-max([load[l] for l in p['links']] + [0]), h[j]) for j, p in zip(range(0, len(packets)), packets)]
+
+  if ordering == 'wdeg':
+    return [-len(p['links']) for p in packets]
+
+  return h
+
+'''
+Builds the state of a search: the packets, the static order (ties
+broken by `ties`, a rank per packet), and what is learnt from failures:
+a weight per link (dom/wdeg) and nogoods, indexed by their assignments.
+@returns the search state
+'''
+def newProblem(packets, num_links, ordering, keys, ties):
+  order = sorted(range(0, len(packets)), key=lambda j : (keys[j] == None, keys[j], ties[j]))
+  return {
+    'packets' : packets,
+    'num_links' : num_links,
+    'ordering' : ordering,
+    'order' : order,
+    'ties' : ties,
+    'weights' : [1 for l in range(0, num_links)],
+    'nogoods' : {},
+    'num_nogoods' : 0
+  }
+
+'''
+Selects the next packet to place. Static orderings follow the order
+of the problem. With dom/wdeg, the unplaced packet with the highest
+ratio of link weights to release window is selected.
+@param release the release time of each packet (None if not placed)
+@param depth the number of packets placed so far
+@returns the index of the next packet
+'''
+def selectNext(problem, release, depth):
+  if problem['ordering'] != 'wdeg':
+    return problem['order'][depth]
+
+  packets = problem['packets']
+  weights = problem['weights']
+  best = None
+  bestScore = None
+  for j in problem['order']:
+    if release[j] == None:
+      p = packets[j]
+      score = sum([weights[l] for l in p['links']]) / (p['latest'] - p['min'] + 1.0)
+      if best == None or score > bestScore:
+        best = j
+        bestScore = score
+  return best
+
+'''
+Checks whether placing packet j at time t completes a nogood.
+@returns True if a nogood holds, False otherwise
+'''
+def violatesNogood(problem, release, j, t):
+  for nogood in problem['nogoods'].get((j, t), []):
+    if all([release[x] == tx for x, tx in nogood if x != j]):
+      return True
+  return False
+
+'''
+Learns from a packet that cannot be placed at any release time. The
+packets taking its links during its release window cause the failure:
+their assignments are recorded as a nogood, and the weights of the
+links they take are increased (dom/wdeg).
+'''
+def learnFailure(problem, intervals, release, p):
+  culprits = set()
+  for l, o in zip(p['links'], p['occupancy']):
+    blocking = overlapping(intervals[l], p['min'], p['latest'] + o)
+    if len(blocking) > 0:
+      problem['weights'][l] += 1
+      culprits.update(blocking)
+
+  if len(culprits) == 0 or len(culprits) > MAX_NOGOOD_SIZE:
+    return
+  if problem['num_nogoods'] >= MAX_NOGOODS:
+    return
+
+  nogood = tuple([(x, release[x]) for x in sorted(culprits)])
+  for x, tx in nogood:
+    if not (x, tx) in problem['nogoods']:
+      problem['nogoods'][(x, tx)] = []
+    problem['nogoods'][(x, tx)].append(nogood)
+  problem['num_nogoods'] += 1
+
+'''
+Places the given packets at the given release times (a prefix of
+the search tree).
+@param intervals interval sets of all links
+@param prefix a list of (packet, release time)
+@param release the release time of each packet, updated in place
+@returns True if all packets of the prefix fit, False otherwise
+'''
+def placePrefix(intervals, packets, prefix, release):
+  for j, t in prefix:
+    if not canPlace(intervals, packets[j], t):
+      return False
+    place(intervals, packets, j, t)
+    release[j] = t
   return True
 
 '''
-Heuristic search. 
-@param M minimum release time values 
-@param O occupancy values
-@param D deadline values 
-@param V problem instance
-@param avp a list of nodes in the problem
-@param h a heuristic vector 
-'''
-def hsearch(M, O, D, space, partial, avp, h, depth=0):
-
-  hsearch.entered += 1
-
-  # print current solution node
-  #os.system('clear')
-  debug("depth:" + str(depth))
-  mprint(partial)
-  print("--")
-  mprint(space)
-
-  # verify whether we reach a leaf node.
-  # if node reached, then evaluate current
-  # solution. If this is a suitable solution, 
-  # return it. Otherwise keep going.
-  if(avp.count(False) == len(avp)):
-    return partial
-
-  # Select next node based on the heuristic. 
-  # Ex. get the lesser slack time
-  nnode = nextnode(avp, h)
-
-  # Copy remaining nodes list and disable current
-  # node from selection
-  navp = vcopy(avp)
-  navp[nnode] = False
-
-  # acquire packet solution range
-  packet_range = (0,0) 
-  for i in range(0, len(space)):
-    if(space[i][nnode] != None):
-      packet_range = space[i][nnode]
-      break
-  
-  # iterate through the range
-  min, max = packet_range
-  #print("current_range:", min, max)
-  for k in range(min, max):
-
-    # copy current solution and replace range
-    # by the values of current iteration
-    vv = mcopy(partial)
-
-    # replace value for that package
-    for i in range(0, len(space)):
-      if(space[i][nnode] != None):
-        vv[i][nnode] = k
-
-    # Check consistency. If branch has a possible
-    # solution, keep searching
-    if(check_consistency(vv, O, nnode)):
-      res = hsearch(M, O, D, space, vv, navp, h, depth + 1)
-      if(res != None):
-        return res
+Heuristic search (depth-first, with an explicit stack). Packets are
+placed one at a time (see selectNext), trying candidate release times
+in increasing order. Placements are undone on backtrack. Packets that
+cannot be placed at all teach the search (see learnFailure). A packet
+placed early is never moved past the event points of the packets
+placed before it, to make room for the packets placed after it, thus
+the search is not complete.
+@param problem the search state (see newProblem)
+@param stats counters of entered and ignored nodes, and failures
+@param prefix (packet, release time) pairs placed beforehand, which
+  are not revisited (the root of a subtree)
+@param limit number of failures after which the search gives up,
+  setting stats['limited'] (None for no limit)
+@param stop event (see multiprocessing.Event), the search gives up
+  once it is set
+@param until time limit, as a time.time() value (None for no limit)
+@returns the release time of each packet, or None if none is found
+'''
+def hsearch(problem, stats, prefix=[], limit=None, stop=None, until=None):
+  packets = problem['packets']
+  intervals = newIntervals(problem['num_links'])
+  release = [None for p in packets]
+  if not placePrefix(intervals, packets, prefix, release):
+    return None
+  base = len(prefix)
+  if base == len(packets):
+    return release
+
+  # one frame per depth: the packet, its candidates, the next
+  # candidate to try, and whether any candidate fit the links so far
+  j = selectNext(problem, release, base)
+  frames = [[j, candidates(intervals, packets[j]), 0, False]]
+  stats['entered'] += 1
+
+  steps = 0
+  failures = 0
+  while len(frames) > 0:
+    depth = base + len(frames) - 1
+    j, cands, k = frames[-1][0:3]
+    p = packets[j]
+
+    steps = steps + 1
+    if steps % STOP_CHECK == 0 and interrupted(stop, until):
+      return None
+
+    # backtracking into this node, undo its previous placement
+    if release[j] != None:
+      unplace(intervals, p, release[j])
+      release[j] = None
+
+    while k < len(cands):
+      if canPlace(intervals, p, cands[k]):
+        if not violatesNogood(problem, release, j, cands[k]):
+          break
+        # failures caused by nogoods are not caused by links alone
+        frames[-1][3] = True
+      stats['ignored'] += 1
+      k = k + 1
+
+    if k == len(cands):
+      if not frames[-1][3]:
+        learnFailure(problem, intervals, release, p)
+      frames.pop()
+      stats['failures'] += 1
+      failures = failures + 1
+      if limit != None and failures > limit:
+        stats['limited'] = True
+        return None
+      continue
+
+    frames[-1][2] = k + 1
+    frames[-1][3] = True
+    place(intervals, packets, j, cands[k])
+    release[j] = cands[k]
+
+    # verify whether we reach a leaf node
+    if depth + 1 == len(packets):
+      return release
+
+    j = selectNext(problem, release, depth + 1)
+    frames.append([j, candidates(intervals, packets[j]), 0, False])
+    stats['entered'] += 1
+
+  return None
+
+'''
+Earliest release time of a packet, no earlier than `lo`, at which it
+fits the intervals placed on its links.
+@param intervals interval sets of all links
+@param p the packet
+@returns the release time, or None if there is none within its window
+'''
+def earliestFit(intervals, p, lo):
+  t = lo
+  while t <= p['latest']:
+    moved = False
+    for l, o in zip(p['links'], p['occupancy']):
+      iv = intervals[l]
+      k = bisect_right(iv['starts'], t + o) - 1
+      if k >= 0 and iv['ends'][k] >= t:
+        t = iv['ends'][k] + 1
+        moved = True
+    if not moved:
+      return t
+  return None
+
+'''
+Checks whether a search must give up: the stop event is set, or the
+time limit is over.
+@param stop event (see multiprocessing.Event), or None
+@param until time limit, as a time.time() value (None for no limit)
+@returns True if the search must give up, False otherwise
+'''
+def interrupted(stop, until):
+  return (stop != None and stop.is_set()) or (until != None and time.time() > until)
+
+'''
+Checks the load of each link: packets on a link need their occupancy
+plus one cycle each, between the earliest minimum release time and the
+latest deadline of the packets on the link.
+@param packets compiled packets (see compileProblem)
+@param num_links the number of links
+@returns the first overloaded link, or None if there is none
+'''
+def findOverload(packets, num_links):
+  demand = [0 for l in range(0, num_links)]
+  lo = [None for l in range(0, num_links)]
+  hi = [None for l in range(0, num_links)]
+  for p in packets:
+    for l, o in zip(p['links'], p['occupancy']):
+      demand[l] += o + 1
+      lo[l] = p['min'] if lo[l] == None else min(lo[l], p['min'])
+      hi[l] = p['deadline'] if hi[l] == None else max(hi[l], p['deadline'])
+  for l in range(0, num_links):
+    if demand[l] > 0 and demand[l] > hi[l] - lo[l] + 1:
+      return l
+  return None
+
+'''
+Builds the state of a chronological search (see csearch): the
+interval sets, the release time, minimum release time (raised by
+postponing) and earliest release time of each packet, a heap of
+(earliest release time, rank, packet) (entries whose packet is placed
+or has moved are skipped, see selectEarliest), the packets on each
+link, the number of unplaced packets and the least occupancy of each
+link, and a trail of changes, as (kind, packet, previous value),
+undone on backtrack: 'p' placements, 'e' earliest and 'l' minimum
+release times.
+@returns the search state
+'''
+def newChrono(problem):
+  packets = problem['packets']
+  num_links = problem['num_links']
+  intervals = newIntervals(num_links)
+  rank = [0 for p in packets]
+  for r, j in enumerate(problem['order']):
+    rank[j] = r
+  onlink = [[] for l in range(0, num_links)]
+  leastocc = [None for l in range(0, num_links)]
+  for j in range(0, len(packets)):
+    for l, o in zip(packets[j]['links'], packets[j]['occupancy']):
+      onlink[l].append((j, o))
+      leastocc[l] = o if leastocc[l] == None else min(leastocc[l], o)
+  earliest = [earliestFit(intervals, p, p['min']) for p in packets]
+  heap = [(earliest[j], rank[j], j) for j in range(0, len(packets)) if earliest[j] != None]
+  heapify(heap)
+  return {
+    'intervals' : intervals,
+    'release' : [None for p in packets],
+    'min' : [p['min'] for p in packets],
+    'earliest' : earliest,
+    'heap' : heap,
+    'rank' : rank,
+    'onlink' : onlink,
+    'unplaced' : [len(onlink[l]) for l in range(0, num_links)],
+    'leastocc' : leastocc,
+    'trail' : [],
+    'placed' : 0
+  }
+
+'''
+Undoes the changes of the trail past the given length.
+'''
+def undoTrail(problem, state, mark):
+  trail = state['trail']
+  earliest = state['earliest']
+  while len(trail) > mark:
+    kind, j, v = trail.pop()
+    if kind == 'p':
+      unplace(state['intervals'], problem['packets'][j], v)
+      state['release'][j] = None
+      state['placed'] -= 1
+      for l in problem['packets'][j]['links']:
+        state['unplaced'][l] += 1
+      heappush(state['heap'], (earliest[j], state['rank'][j], j))
+    elif kind == 'e':
+      earliest[j] = v
+      if v != None:
+        heappush(state['heap'], (v, state['rank'][j], j))
     else:
-      hsearch.ignored += 1
+      state['min'][j] = v
+
+'''
+Updates the earliest release time of packet j, no earlier than `lo`.
+@returns False if the packet can no longer be released, True otherwise
+'''
+def updateEarliest(problem, state, j, lo):
+  earliest = state['earliest']
+  state['trail'].append(('e', j, earliest[j]))
+  earliest[j] = earliestFit(state['intervals'], problem['packets'][j], lo)
+  if earliest[j] == None:
+    return False
+  heappush(state['heap'], (earliest[j], state['rank'][j], j))
+  return True
+
+'''
+Releases packet j at time t, and updates the earliest release time of
+the unplaced packets whose earliest interval it now takes.
+@returns False if some packet can no longer be released (or a nogood
+  holds), True otherwise
+'''
+def releaseAt(problem, state, j, t):
+  release = state['release']
+  earliest = state['earliest']
+  if violatesNogood(problem, release, j, t):
+    return False
+  p = problem['packets'][j]
+  place(state['intervals'], problem['packets'], j, t)
+  release[j] = t
+  state['placed'] += 1
+  state['trail'].append(('p', j, t))
+  for l in p['links']:
+    state['unplaced'][l] -= 1
+  for l, o in zip(p['links'], p['occupancy']):
+    for k, ok in state['onlink'][l]:
+      if release[k] == None and earliest[k] <= t + o and earliest[k] + ok >= t:
+        if not updateEarliest(problem, state, k, max(state['min'][k], t)):
+          return False
+  return True
+
+'''
+Releases packet j after time t. It then starts right after the end of
+an interval on one of its links, ending at t or later: of a placed
+packet, or of another unplaced one, which is released at t or later.
+@returns False if the packet can no longer be released, True otherwise
+'''
+def postpone(problem, state, j, t):
+  p = problem['packets'][j]
+  bound = None
+  for l in p['links']:
+    ends = state['intervals'][l]['ends']
+    a = bisect_left(ends, t)
+    if a < len(ends):
+      bound = ends[a] + 1 if bound == None else min(bound, ends[a] + 1)
+    if state['unplaced'][l] > 1:
+      e = t + state['leastocc'][l] + 1
+      bound = e if bound == None else min(bound, e)
+  if bound == None or bound > p['latest']:
+    return False
+  state['trail'].append(('l', j, state['min'][j]))
+  state['min'][j] = bound
+  return updateEarliest(problem, state, j, bound)
+
+'''
+Selects the unplaced packet with the earliest release time, ties
+broken by the static order. Heap entries of placed packets, or of
+earliest release times that have changed since, are dropped (undoing
+a change pushes its entry back).
+@returns the index of the packet
+'''
+def selectEarliest(state):
+  heap = state['heap']
+  while True:
+    t, r, j = heap[0]
+    if state['release'][j] == None and state['earliest'][j] == t:
+      return j
+    heappop(heap)
+
+'''
+Chronological search (depth-first, with an explicit stack). Every node
+takes the unplaced packet that can be released the earliest (see
+selectEarliest), at its earliest release time t, and branches on it:
+the packet is either released at t, or later (see postpone). Any
+schedule can be shifted back until every packet is released at its
+minimum release time or right after a packet sharing a link with it,
+so the branches cover every schedule. The search gives up once it has
+entered `nodes` nodes, the stop event is set or the time limit is
+over, setting stats['limited']. Otherwise, None means that there is
+no solution.
+@param problem the search state (see newProblem), whose order breaks
+  ties between packets released at the same time
+@param stats counters of entered and ignored nodes, and failures
+@param stop event (see multiprocessing.Event), the search gives up
+  once it is set
+@param until time limit, as a time.time() value (None for no limit)
+@param nodes number of nodes after which the search gives up (None
+  for no limit)
+@returns the release time of each packet, or None if none is found
+'''
+def csearch(problem, stats, stop=None, until=None, nodes=CHRONO_NODES):
+  state = newChrono(problem)
+  if len(problem['packets']) == 0:
+    return state['release']
+  if None in state['earliest']:
+    return None
+
+  # one frame per depth: the packet, its release time, the next
+  # branch to try (0 at t, 1 later, 2 none left), and the trail
+  # length when the node was entered
+  j = selectEarliest(state)
+  frames = [[j, state['earliest'][j], 0, 0]]
+  stats['entered'] += 1
+
+  steps = 0
+  while len(frames) > 0:
+    frame = frames[-1]
+    j, t, branch, mark = frame
+
+    steps = steps + 1
+    if steps % STOP_CHECK == 0 and interrupted(stop, until):
+      stats['limited'] = True
+      return None
+    if nodes != None and stats['entered'] > nodes:
+      stats['limited'] = True
+      return None
+
+    # backtracking into this node, undo its previous branch
+    undoTrail(problem, state, mark)
+
+    if branch == 2:
+      frames.pop()
+      stats['failures'] += 1
+      continue
+
+    frame[2] = branch + 1
+    if branch == 0:
+      fit = releaseAt(problem, state, j, t)
+    else:
+      fit = postpone(problem, state, j, t)
+    if not fit:
+      stats['ignored'] += 1
+      continue
+
+    # verify whether we reach a leaf node
+    if state['placed'] == len(problem['packets']):
+      return state['release']
+
+    j = selectEarliest(state)
+    frames.append([j, state['earliest'][j], 0, len(state['trail'])])
+    stats['entered'] += 1
 
   return None
 
+'''
+Search with randomized restarts. Each run gives up after a number of
+failures that follows the luby sequence. Ties of the ordering are
+broken at random in every run but the first. Nogoods and link weights
+are kept across runs. Candidates are restricted to event points, thus
+a run that exhausts its tree does not prove there is no solution, and
+is restarted as well (up to MAX_RESTARTS runs, see searchPackets for
+what follows).
+@param seed seed of the random tie-breaking
+@param stop event, the search gives up once it is set
+@param until time limit, as a time.time() value (None for no limit)
+@returns the release time of each packet, or None if none is found
+'''
+def rsearch(problem, stats, keys, seed=None, stop=None, until=None):
+  rng = random.Random(seed)
+  run = 1
+  while True:
+    stats['limited'] = False
+    release = hsearch(problem, stats, [], RESTART_BASE * luby(run), stop, until)
+    if release != None or run >= MAX_RESTARTS or interrupted(stop, until):
+      return release
+
+    # restart, ties broken at random
+    run = run + 1
+    stats['restarts'] += 1
+    ties = list(range(0, len(problem['packets'])))
+    rng.shuffle(ties)
+    problem['ties'] = ties
+    problem['order'] = sorted(problem['order'], key=lambda j : (keys[j] == None, keys[j], ties[j]))
+
+'''
+Splits the first levels of the search tree into subtrees, expanding
+one level at a time until there are at least `target` subtrees (or
+all packets are placed). Subtrees are kept in the order the sequential
+search would visit them.
+@returns a list of prefixes, each one a list of (packet, release time)
+'''
+def splitTree(problem, target, stats):
+  packets = problem['packets']
+  prefixes = [[]]
+  depth = 0
+  while len(prefixes) < target and depth < len(packets):
+    expanded = []
+    for prefix in prefixes:
+      intervals = newIntervals(problem['num_links'])
+      release = [None for p in packets]
+      placePrefix(intervals, packets, prefix, release)
+      j = selectNext(problem, release, depth)
+      p = packets[j]
+      stats['entered'] += 1
+      for t in candidates(intervals, p):
+        if canPlace(intervals, p, t):
+          expanded.append(prefix + [(j, t)])
+        else:
+          stats['ignored'] += 1
+    prefixes = expanded
+    depth = depth + 1
+  return prefixes
 
 '''
-Self-counting!
+Sets up a worker process of the parallel search.
 '''
-hsearch.entered = 0
-hsearch.ignored = 0
+def initWorker(event):
+  global stop_event
+  stop_event = event
 
-def search3(min_start, occupancy, deadline):
-  
-  # Initial solution has no packets placed yet.
-  # Rationally: select packet with the highest
-  # value for the given heuristic. Place the 
-  # selected packet and then select another one.
-  partial_solution = [[None for x in occupancy[0]] for y in occupancy]
+'''
+Searches one subtree (worker process).
+@returns the release times found (or None) and the node counters
+'''
+def searchSubtree(args):
+  problem, prefix, until = args
+  stats = newStats()
+  release = hsearch(problem, stats, prefix, None, stop_event, until)
+  return release, stats
 
-  # Generate ranges of solution here. At this 
-  # point, we proceed as Minizinc, using intervalar
-  # arithmetics. Sparse matrix notation takes '-1' as 
-  solution_space = mcopy(occupancy)
-  for i in range(0, len(solution_space)):
-    for j in range(0, len(solution_space[i])):
-      cell = solution_space[i][j]
-      if(cell != None):
-        solution_space[i][j] = (min_start[i][j], deadline[i][j] - occupancy[i][j])
+'''
+Parallel heuristic search. The first levels of the tree are split
+into subtrees, which are searched by a pool of worker processes. There
+are many more subtrees than workers, so idle workers keep taking
+pending subtrees. The first solution found stops all workers, and so
+do the given stop event and the time limit.
+@param workers number of processes (defaults to the number of cores)
+@param stop event, the search gives up once it is set
+@param until time limit, as a time.time() value (None for no limit)
+@returns the release time of each packet, or None if none is found
+'''
+def psearch(problem, stats, workers=None, stop=None, until=None):
+  if workers == None:
+    workers = os.cpu_count()
+
+  prefixes = splitTree(problem, workers * SPLIT_FACTOR, stats)
+  if len(prefixes) == 0:
+    return None
+
+  found = Event()
+  release = None
+  with ProcessPoolExecutor(max_workers=workers, initializer=initWorker, initargs=(found,)) as pool:
+    futures = [pool.submit(searchSubtree, (problem, prefix, until)) for prefix in prefixes]
+    pending = set(futures)
+    while len(pending) > 0 and release == None and not interrupted(stop, until):
+      done, pending = wait(pending, timeout=STOP_POLL, return_when=FIRST_COMPLETED)
+      for future in done:
+        res, substats = future.result()
+        for c in ['entered', 'ignored', 'failures']:
+          stats[c] += substats[c]
+        if res != None and release == None:
+          release = res
+
+    found.set()
+    for f in futures:
+      f.cancel()
+
+  return release
 
-  # List of packets fixed in the solution so far
-  avp = [True for i in occupancy[0]]
+'''
+Counters of a search, whether it fell back to chronological search
+(`chrono`), and its outcome (`status`): 'solved', 'unsatisfiable' if
+it proved that there is no solution, or 'unknown' if it gave up.
+'''
+def newStats():
+  return {'entered' : 0, 'ignored' : 0, 'failures' : 0, 'restarts' : 0, 'limited' : False,
+    'chrono' : False, 'status' : 'unknown'}
 
-  # Heuristic
-  h = lstf(solution_space)
+'''
+Searches for a release time per packet, such that packets never share
+a link at the same time. Overloaded links are rejected first (see
+findOverload). The heuristic search (see hsearch, rsearch and psearch)
+is not complete, so if it finds nothing the chronological search (see
+csearch) takes over, within CHRONO_NODES nodes. Both give up once the
+stop event is set or the timeout is over. stats['status'] tells
+whether None proves that there is no solution.
+@param packets compiled packets (see compileProblem)
+@param num_links the number of links
+@param workers number of processes, 1 for sequential search, None
+  for one process per core
+@param ordering variable ordering, one of ORDERINGS
+@param restarts whether to restart the search (sequential search only)
+@param seed seed of the random tie-breaking of restarts
+@param stats dictionary filled with the counters and the outcome of
+  the search (see newStats), if given
+@param stop event (see multiprocessing.Event), the search gives up
+  once it is set
+@param timeout seconds after which the search gives up (None for no
+  limit)
+@returns the release time of each packet, or None
+'''
+def searchPackets(packets, num_links, workers=1, ordering='edf', restarts=True, seed=None, stats=None,
+  stop=None, timeout=None):
+  if not ordering in ORDERINGS:
+    error("Unknown ordering `" + str(ordering) + "`, expected one of " + ", ".join(ORDERINGS))
+    exit(1)
+
+  if stats == None:
+    stats = {}
+  stats.update(newStats())
+
+  until = None if timeout == None else time.time() + timeout
+
+  # packets whose window is too short fit nowhere, and overloaded
+  # links fit no schedule
+  for p in packets:
+    if p['latest'] < p['min']:
+      stats['status'] = 'unsatisfiable'
+      return None
+  if findOverload(packets, num_links) != None:
+    stats['status'] = 'unsatisfiable'
+    return None
+
+  keys = getKeys(packets, num_links, ordering)
+  problem = newProblem(packets, num_links, ordering, keys, list(range(0, len(packets))))
+
+  if workers != 1:
+    release = psearch(problem, stats, workers, stop, until)
+  elif restarts:
+    release = rsearch(problem, stats, keys, seed, stop, until)
+  else:
+    release = hsearch(problem, stats, [], None, stop, until)
+
+  if release == None and not interrupted(stop, until):
+    stats['chrono'] = True
+    stats['limited'] = False
+    release = csearch(problem, stats, stop, until)
+    if release == None and not stats['limited']:
+      stats['status'] = 'unsatisfiable'
+
+  if release != None:
+    stats['status'] = 'solved'
+  return release
 
-  # call search at node zero
-  return (hsearch(min_start, occupancy, deadline, solution_space, partial_solution, avp, h), hsearch.entered, hsearch.ignored)
+'''
+Searches for a release time per packet (see searchPackets), given the
+link-by-packet matrices of the problem.
+@param min_start minimum release time values
+@param occupancy occupancy values
+@param deadline deadline values
+@param windows window of each packet (see compileProblem)
+@returns the solution matrix (None if no solution is found), and the
+  number of entered and ignored nodes
+'''
+def search3(min_start, occupancy, deadline, workers=1, ordering='edf', restarts=True, seed=None, stats=None, windows=None):
+  if stats == None:
+    stats = {}
+  packets = compileProblem(min_start, occupancy, deadline, windows)
+  release = searchPackets(packets, len(occupancy), workers, ordering, restarts, seed, stats)
+
+  if release == None:
+    return (None, stats['entered'], stats['ignored'])
+
+  # solution matrix, the release time of each packet on each of its links
+  solution = [[None for x in occupancy[0]] for y in occupancy]
+  for j in range(0, len(packets)):
+    for i in packets[j]['links']:
+      solution[i][j] = release[j]
+
+  return (solution, stats['entered'], stats['ignored'])
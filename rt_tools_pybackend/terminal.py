@@ -1,16 +1,10 @@
 # generate string of whitespaces
 def genwss(len):
-  buf = ""
-  i = 0
-  for i in range(i, len):
-    buf = buf + ' '
-  return buf
+  return ' ' * len
 
 # zero fill
 def wsfill(num, pad):
-  nstr = str(num)
-  fill = genwss(pad - len(nstr))
-  return fill + nstr
+  return str(num).rjust(pad)
 
 def info(msg, end='\n\r'):
   print(colors.OK + "info: " + colors.END + str(msg), end=end)